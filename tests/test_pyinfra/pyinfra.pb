@@ -1,13 +1,17 @@
 #!/usr/bin/env -S python3 -m uplaybook.cli
 
 from uplaybook import fs, core, pyinfra
+from uplaybook.internals import Failure
 import os
+import sys
 
 def cleanup():
     fs.rm(path="testdir", recursive=True)
 
 fs.rm(path="testdir", recursive=True)
 fs.mkdir(path="testdir")
+[getattr(pyinfra, name) for name in dir(pyinfra)]
+assert not pyinfra._workers
 with fs.cd(path="testdir"):
     pyinfra.files.directory(path="infradir")
     assert os.path.exists("infradir")
@@ -16,4 +20,153 @@ with fs.cd(path="testdir"):
     pyinfra.files.directory(path="infradir", present=False)
     assert not os.path.exists("infradir")
 
+    pyinfra.files.directory(path="infradir")
+    os.rmdir("infradir")
+    assert pyinfra.files.directory(path="infradir").changed
+    assert os.path.exists("infradir")
+    with pyinfra.batch():
+        assert pyinfra.files.directory(path="infradir2").changed
+        assert pyinfra.files.directory(path="infradir2").extra_message == "cached"
+
     pyinfra.files.file(path="infrafile")
+
+    with pyinfra.batch():
+        batch_dir = pyinfra.files.directory(path="batchdir")
+        batch_file = pyinfra.files.file(path="batchdir/file")
+        batch_dir_again = pyinfra.files.directory(path="batchdir")
+    assert batch_dir.changed and batch_file.changed and not batch_dir_again.changed
+    assert os.path.exists("batchdir/file")
+
+    with pyinfra.batch():
+        batch_dir = pyinfra.files.directory(path="batchdir2")
+        assert batch_dir.changed
+        assert os.path.exists("batchdir2")
+
+    assert not pyinfra.files.file(path="infrafile").changed
+    fs.rm(path="infrafile")
+    assert pyinfra.files.file(path="infrafile").changed
+
+    pyinfra.files.line(path="infrafile", line="first")
+    with pyinfra.batch():
+        pyinfra.files.line(path="infrafile", line="first", replace="second")
+        pyinfra.files.line(path="infrafile", line="second", present=False)
+    assert open("infrafile").read() == "\n"
+
+    with open("putlinefile", "w") as fp:
+        fp.write("MARK\n")
+    with open("putlinesrc", "w") as fp:
+        fp.write("new\n")
+    with pyinfra.batch():
+        pyinfra.files.put(src="putlinesrc", dest="putlinefile")
+        put_line = pyinfra.files.line(path="putlinefile", line="MARK")
+    assert put_line.changed and open("putlinefile").read() == "new\nMARK\n"
+
+    assert pyinfra.files.put(src="infrafile", dest="infracopy").changed
+    assert os.path.exists("infracopy")
+    assert not pyinfra.files.put(src="infrafile", dest="infracopy").changed
+
+    with pyinfra.batch(parallel=2):
+        pyinfra.files.directory(path="parallel1")
+        pyinfra.files.file(path="parallel1/file")
+        pyinfra.files.directory(path="parallel2")
+    assert os.path.exists("parallel1/file") and os.path.exists("parallel2")
+
+    assert not pyinfra.files.download(
+        src="http://127.0.0.1:9/infrafile",
+        dest="infrafile",
+        sha256sum="01ba4719c80b6fe911b091a7c05124b64eeece964e09c058ef8f9805daca546b",
+    ).changed
+
+    pyinfra.files.line(path="infrafile", line="third")
+    assert not pyinfra.files.line(path="infrafile", line="third").changed
+    assert not pyinfra.files.line(path="infrafile", line="fourth", present=False).changed
+    assert not pyinfra.files.replace(path="infrafile", text="fourth", replace="x").changed
+    assert pyinfra.files.replace(path="infrafile", text="third", replace="fourth").changed
+    assert open("infrafile").read() == "\nfourth\n"
+
+    with pyinfra.batch():
+        dedup_first = pyinfra.files.directory(path="dedupdir")
+        pyinfra.files.directory(path="dedupother")
+        dedup_second = pyinfra.files.directory(path="dedupdir")
+    assert dedup_first.changed and not dedup_second.changed
+
+    try:
+        with pyinfra.batch():
+            batch_failed = pyinfra.server.shell(commands=["false"])
+            batch_not_run = pyinfra.files.directory(path="notrundir")
+    except Failure:
+        pass
+    assert batch_failed.failure and batch_not_run.failure
+    assert not os.path.exists("notrundir")
+
+    try:
+        with pyinfra.batch():
+            batch_discarded = pyinfra.files.directory(path="discardeddir")
+            raise ValueError("stop")
+    except ValueError:
+        pass
+    assert batch_discarded.failure and batch_discarded.extra_message == "not run"
+    assert not os.path.exists("discardeddir")
+
+    try:
+        with pyinfra.batch():
+            batch_unresolved = pyinfra.files.directory(path="okdir")
+            pyinfra.files.put(src="does-not-exist", dest="putdest")
+    except pyinfra.PyInfraFailed:
+        pass
+    assert batch_unresolved.pending is None and batch_unresolved.failure
+
+    with pyinfra.batch():
+        pyinfra.files.file(path="nestedfile")
+        with pyinfra.batch():
+            pyinfra.files.line(path="nestedfile", line="nested")
+    assert open("nestedfile").read() == "nested\n"
+
+    assert pyinfra.files.get(src="infracopy", dest="infraget").changed
+    assert not pyinfra.files.get(src="infracopy", dest="infraget").changed
+
+    core.run(command="git init -q gitrepo")
+    assert pyinfra.git.config(key="user.name", value="Test", repo="gitrepo").changed
+    assert not pyinfra.git.config(key="user.name", value="Test", repo="gitrepo").changed
+    gitrepo = os.path.abspath("gitrepo")
+    assert pyinfra.git.repo(src=gitrepo, dest="gitclone", pull=False).changed
+    assert not pyinfra.git.repo(src=gitrepo, dest="gitclone", pull=False).changed
+
+    from io import StringIO
+    assert pyinfra.files.put(src=StringIO("from a StringIO\n"), dest="infrastringio").changed
+    assert open("infrastringio").read() == "from a StringIO\n"
+
+    containers = [{"name": "web", "status": "Running"}]
+    assert pyinfra.lxd.get_container_named(name="web", containers=containers).extra.container
+    assert pyinfra.lxd.get_container_named(name="db", containers=[]).extra.container is None
+
+    assert pyinfra._local_facts_apply()
+    with pyinfra.global_args(_sudo=True):
+        assert not pyinfra._local_facts_apply()
+    with pyinfra.global_args(_env={"HOME": "/root"}):
+        assert not pyinfra._local_facts_apply()
+
+    pip = os.path.join(os.path.dirname(sys.executable), "pip")
+    assert not pyinfra.pip.packages(packages=["pip"], pip=pip).changed
+    pip_result = pyinfra.pip.packages(packages=["pip"], pip=pip)
+    assert pip_result.extra_message == "already in state"
+    assert not pyinfra.pip.packages(packages=["no-such-package"], present=False, pip=pip).changed
+    with pyinfra.global_args(_env={"PIP_USER": "0"}):
+        pip_result = pyinfra.pip.packages(packages=["pip"], pip=pip)
+    assert not pip_result.changed and pip_result.extra_message != "already in state"
+
+    assert pyinfra.server.shell(commands=["true"]).changed
+    with open("infrascript.j2", "w") as fp:
+        fp.write("echo {{ word }} > infrascript.out\n")
+    assert pyinfra.server.script_template(src="infrascript.j2", word="hello").changed
+    assert open("infrascript.out").read() == "hello\n"
+
+    assert pyinfra.server.partition(lambda n: n > 1, [1, 2, 3]) == ([2, 3], [1])
+    assert pyinfra.server.comma_sep([0, 30]) == "0,30"
+
+    assert not pyinfra.windows_files.download(
+        src="http://127.0.0.1:9/infracopy",
+        dest="infracopy",
+        sha256sum="01ba4719c80b6fe911b091a7c05124b64eeece964e09c058ef8f9805daca546b",
+    ).changed
+    assert not pyinfra.windows_files.put(src="infrafile", dest="infrafile").changed
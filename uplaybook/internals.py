@@ -232,6 +232,28 @@ def template_args(func: Callable[..., Any]) -> Callable[..., Any]:
     """
     sig = inspect.signature(func)
 
+    #  Work out which arguments are templates once, rather than on every call:
+    #  name -> (is a list of templates, is a template)
+    template_params = {}
+    for name, param in sig.parameters.items():
+        annotation = param.annotation
+        is_list = (
+            annotation == Optional[List[TemplateStr]] or annotation == List[TemplateStr]
+        )
+        # Check for TemplateStr directly or as part of a Union
+        try:
+            is_str = annotation is TemplateStr or (
+                hasattr(annotation, "__origin__")
+                and issubclass(TemplateStr, annotation.__args__)
+            )
+        except TypeError:
+            is_str = False
+        if is_list or is_str:
+            template_params[name] = (is_list, is_str)
+
+    if not template_params:
+        return func
+
     def _render_jinja_arg(s: str) -> str:
         """Render the arguments as Jinja2, use the up_context and the calling environment.
         NOTE: This is hardcoded to be run from inside this decorator
@@ -246,25 +268,20 @@ def template_args(func: Callable[..., Any]) -> Callable[..., Any]:
         # Convert args to mutable list
         args = list(args)
 
-        # Get bound arguments
+        # Get bound arguments, only those that were given
         bound_args = sig.bind(*args, **kwargs)
-        bound_args.apply_defaults()
 
         # Process bound arguments and replace if type is TemplateStr
-        for name, value in bound_args.arguments.items():
-            if value not in args and name not in kwargs:
+        for name, (is_list, is_str) in template_params.items():
+            if name not in bound_args.arguments:
                 continue
+            value = bound_args.arguments[name]
             if not (
-                isinstance(value, list) and isinstance(value[0], str)
+                isinstance(value, list) and value and isinstance(value[0], str)
             ) and not isinstance(value, str):
                 continue
 
-            annotation = sig.parameters[name].annotation
-
-            if (
-                annotation == Optional[List[TemplateStr]]
-                or annotation == List[TemplateStr]
-            ) and isinstance(value, list):
+            if is_list and isinstance(value, list):
                 if name in kwargs:
                     kwargs[name] = list([_render_jinja_arg(x) for x in value])
                 else:
@@ -272,14 +289,7 @@ def template_args(func: Callable[..., Any]) -> Callable[..., Any]:
                         [_render_jinja_arg(x) for x in value]
                     )
 
-            # Check for TemplateStr directly or as part of a Union
-            elif isinstance(value, str) and (
-                annotation is TemplateStr
-                or (
-                    hasattr(annotation, "__origin__")
-                    and issubclass(TemplateStr, annotation.__args__)
-                )
-            ):
+            elif is_str and isinstance(value, str):
                 if name in kwargs:
                     kwargs[name] = _render_jinja_arg(value)
                 else:
@@ -347,6 +357,12 @@ def task(func: Callable[..., Any]) -> Callable[..., Any]:
     return calling_context(template_args(func))
 
 
+#  Attributes of a Return that are only available once its result is known.
+_RETURN_RESULT_ATTRS = frozenset(
+    ["changed", "failure", "success", "extra_message", "output", "extra"]
+)
+
+
 class Return:
     """
     A return type from tasks to track success/failure, display status, etc...
@@ -380,6 +396,11 @@ class Return:
         context_manager: This type can optionally behave as a Context Manager, and if so this function
                 will be called with no parameters at the end of the context.  Use a closure if you want to
                 associate data with the function call ("lambda: function(args)").  (optional, Callable).
+        pending: If given, the result of the task is not known yet (for example, it is queued to run
+                later).  `changed`, `failure`, `success`, `extra_message`, `output` and `extra` are
+                ignored, the status is displayed and counted when `resolve()` is called.  If the
+                result is used before then, this function is called with no parameters and must
+                call `resolve()`.  (optional, Callable)
 
     Examples:
 
@@ -388,8 +409,28 @@ class Return:
         Return(changed=True, extra_message="Permissions")
         Return(changed=True, extra=SimpleNamespace(stderr=s))
         Return(changed=True, context_manager=lambda: f(arg))
+        Return(changed=False, pending=batch.flush)
     """
 
+    #  Tasks return one of these per call, so they are kept small.
+    __slots__ = (
+        "hide_args",
+        "secret_args",
+        "raise_exc",
+        "context_manager",
+        "call",
+        "call_depth",
+        "failure_ok",
+        "pending",
+        "pending_handlers",
+        "changed",
+        "failure",
+        "success",
+        "extra_message",
+        "output",
+        "extra",
+    )
+
     def __init__(
         self,
         changed: bool,
@@ -403,26 +444,63 @@ class Return:
         extra: Optional[SimpleNamespace] = None,
         raise_exc: Optional[Exception] = None,
         context_manager: Optional[Callable] = None,
+        pending: Optional[Callable] = None,
+    ) -> None:
+        self.hide_args = hide_args
+        self.secret_args = secret_args
+        self.raise_exc = raise_exc
+        self.context_manager = context_manager
+
+        #  The call is recorded now, while the task is on the stack, the status may be
+        #  displayed later if the result is pending.
+        self.call = self._format_call()
+        self.call_depth = up_context.call_depth
+        self.failure_ok = ignore_failure or up_context.ignore_failures is True
+        self.pending = pending
+        self.pending_handlers = []
+
+        if pending is None:
+            self.resolve(
+                changed=changed,
+                failure=failure,
+                success=success,
+                extra_message=extra_message,
+                output=output,
+                extra=extra,
+            )
+
+    def resolve(
+        self,
+        changed: bool,
+        failure: bool = False,
+        success: Optional[bool] = None,
+        extra_message: Optional[str] = None,
+        output: Optional[str] = None,
+        extra: Optional[SimpleNamespace] = None,
     ) -> None:
+        """
+        Set the result of the task, display the status and count it.
+
+        This is done when the Return is created, unless it is `pending`.  The arguments
+        are as for the Return.
+
+        Raises:
+            Failure: If `failure` and failures are not being ignored, or `raise_exc`.
+        """
         self.changed = changed
         self.extra_message = extra_message
         self.output = output
-        self.hide_args = hide_args
         self.extra = extra
         self.failure = failure
-        self.secret_args = secret_args
-        self.raise_exc = raise_exc
-        self.context_manager = context_manager
         self.success = success
+        self.pending = None
 
         self.print_status()
 
-        failure_ok = ignore_failure or up_context.ignore_failures is True
-
         up_context.total_count += 1
         if changed:
             up_context.changed_count += 1
-        if failure and not failure_ok:
+        if failure and not self.failure_ok:
             up_context.failure_count += 1
             raise self.raise_exc if self.raise_exc is not None else Failure(
                 "Unspecified failure in task"
@@ -430,6 +508,20 @@ class Return:
         if self.raise_exc:
             raise self.raise_exc
 
+        for handler in self.pending_handlers:
+            self.notify(handler)
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Wait for the result of a pending Return when one of the result attributes is used.
+        """
+        if name not in _RETURN_RESULT_ATTRS or self.pending is None:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            )
+        self.pending()
+        return object.__getattribute__(self, name)
+
     def __enter__(self) -> "Return":
         """
         Begin a context if used as a context manager.
@@ -453,9 +545,9 @@ class Return:
         assert self.context_manager is not None
         self.context_manager()
 
-    def print_status(self) -> None:
+    def _format_call(self) -> str:
         """
-        Display the output and status of the task.
+        Format the task call, its name and arguments, for the status line.
         """
         parent_function_name = "<Unknown>"
         for parent_frame_info in inspect.stack()[2:]:
@@ -482,6 +574,12 @@ class Return:
                 ]
             )
 
+        return f"{parent_function_name}({call_args})"
+
+    def print_status(self) -> None:
+        """
+        Display the output and status of the task.
+        """
         add_msg = f" ({self.extra_message})" if self.extra_message else ""
 
         prefix = "=#"
@@ -497,10 +595,10 @@ class Return:
         elif self.success:
             prefix = "=."
             style = "green"
-        call_depth = "=" * up_context.call_depth
+        call_depth = "=" * self.call_depth
 
         up_context.console.print(
-            f"{call_depth}{prefix} {parent_function_name}({call_args}){add_msg}{suffix}",
+            f"{call_depth}{prefix} {self.call}{add_msg}{suffix}",
             style=style,
             highlight=False,
             markup=False,
@@ -545,6 +643,10 @@ class Return:
             handler:  A function or a list of functions to register for calling later,
                     if the task has changed the system.  (callable or list)
         """
+        if self.pending is not None:
+            self.pending_handlers.append(handler)
+            return
+
         if self.changed or self.success == True:
             if callable(handler):
                 up_context.add_handler(handler)
@@ -15,22 +15,177 @@ __is_task_module__ = True
 
 #  Full docs are in `docs/tasks/pyinfra/intro.md`
 
-from collections import namedtuple
-from typing import Dict
-import tempfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    IO,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from types import ModuleType
+import atexit
+import importlib
+import inspect
+import json
+import math
+import pickle
 import subprocess
+import sys
 import os
-import re
+import tempfile
+import threading
+import time
+
+from ..internals import task, Return, up_context
+
+
+@dataclass(slots=True, frozen=True)
+class PyInfraResults:
+    """
+    The operation counts reported by a pyinfra run.
+    """
+
+    changed: int
+    no_change: int
+    errors: int
+
+    @classmethod
+    def from_statuses(cls, statuses: List[str]) -> "PyInfraResults":
+        """Count the operation statuses returned by the worker."""
+        return cls(
+            statuses.count("Success"),
+            statuses.count("No changes"),
+            statuses.count("Error"),
+        )
+
+
+#  The worker processes that run the pyinfra operations, started on first use.  Usually
+#  there is just one, more are started to run operations in parallel, see `batch()`.
+_WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "_worker.py")
+_workers: List[subprocess.Popen] = []
+_idle_workers: List[subprocess.Popen] = []
+_workers_lock = threading.Lock()
+#  The imports each worker has run, so they are only sent to it once.
+_worker_imports: Dict[subprocess.Popen, Set[str]] = {}
+#  The file each worker's stderr goes to, to report why a worker exited.  A file
+#  rather than a pipe, so a worker writing a lot to stderr can't block on it.
+_worker_stderr: Dict[subprocess.Popen, IO[bytes]] = {}
+#  Number of bytes of a worker's stderr to report if it exits unexpectedly.
+_WORKER_STDERR_TAIL = 4096
+
+
+#  Global arguments applied to every pyinfra operation for the whole playbook.
+pyinfra_global_args: Dict[str, object] = {}
+
+#  Per-context overrides of the global arguments, see `global_args()`.
+_global_args_override: ContextVar[Optional[Dict[str, object]]] = ContextVar(
+    "pyinfra_global_args", default=None
+)
+
+
+def _current_global_args() -> Dict[str, object]:
+    """Return the global arguments in effect for the current context."""
+    override = _global_args_override.get()
+    return pyinfra_global_args if override is None else override
+
+
+#  Global arguments that change the user or environment operations are run with.
+_CONTEXT_GLOBAL_ARGS = (
+    "_sudo",
+    "_sudo_user",
+    "_use_sudo_login",
+    "_preserve_sudo_env",
+    "_su_user",
+    "_use_su_login",
+    "_preserve_su_env",
+    "_su_shell",
+    "_doas",
+    "_doas_user",
+    "_shell_executable",
+    "_env",
+)
+
+
+def _local_facts_apply() -> bool:
+    """
+    Would pyinfra see the same system as the facts in `_facts`?
+
+    Those facts are gathered as the invoking user, with the current environment.  If
+    the global arguments run operations as another user (`_sudo`, `_su_user`...) or with
+    another environment (`_env`), pyinfra may see different packages or services, so
+    prechecks must leave the operation to pyinfra.
+    """
+    global_args = _current_global_args()
+    return not any(global_args.get(arg) for arg in _CONTEXT_GLOBAL_ARGS)
 
-PyInfraResults = namedtuple("PyInfraResults", ["changed", "no_change", "errors"])
 
+#  Types whose repr() is Python source for an equal value.
+_LITERAL_TYPES = (str, bytes, int, float, bool, type(None))
 
-class PyInfraGlobalArgContext(dict):
-    def __init__(self):
-        super().__init__(self)
 
+def _is_literal(value: object) -> bool:
+    """Can `value` be passed to the worker as its repr()?"""
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, _LITERAL_TYPES):
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(_is_literal(item) for item in value)
+    if isinstance(value, dict):
+        return all(_is_literal(k) and _is_literal(v) for k, v in value.items())
+    return False
 
-pyinfra_global_args = PyInfraGlobalArgContext()
+
+def _operarg(value: object) -> str:
+    """
+    Python source for the value of an operation argument.
+
+    Most values are passed as their repr().  Other values, like a StringIO for
+    `files.put()`, are pickled, and unpickled by the worker.
+    """
+    if _is_literal(value):
+        return repr(value)
+    return f"_unpickle({pickle.dumps(value)!r})"
+
+
+def _with_global_args(operargs: str) -> str:
+    """Add the global arguments in effect to the `operargs` of an operation."""
+    global_args = _current_global_args()
+    if not global_args:
+        return operargs
+    return ", ".join(
+        [operargs] * bool(operargs) + [f"{k}={v!r}" for k, v in global_args.items()]
+    )
+
+
+@contextmanager
+def global_args(**kwargs: object) -> Iterator[None]:
+    """
+    A context manager to set pyinfra global arguments for the enclosed tasks.
+
+    The arguments are layered on top of `pyinfra_global_args` and only apply to the
+    current thread/context, so they are safe to use from concurrently running tasks.
+
+    Example:
+
+        with pyinfra.global_args(_sudo=True):
+            pyinfra.systemd.service(service="apache2", restarted=True)
+    """
+    token = _global_args_override.set({**_current_global_args(), **kwargs})
+    try:
+        yield
+    finally:
+        _global_args_override.reset(token)
 
 
 class PyInfraFailed(Exception):
@@ -39,8 +194,137 @@ class PyInfraFailed(Exception):
         super().__init__(message, stdout, stderr)
 
 
+def _stop_workers() -> None:
+    """Stop the worker processes."""
+    with _workers_lock:
+        for worker in _workers:
+            worker.stdin.close()
+            #  A worker may not have finished starting, there's no need to wait for it
+            worker.terminate()
+            worker.wait()
+            _worker_stderr.pop(worker).close()
+        _workers.clear()
+        _idle_workers.clear()
+        _worker_imports.clear()
+
+
+def _start_worker() -> subprocess.Popen:
+    """
+    Start a worker process, the caller must hold `_workers_lock`.
+    """
+    if not _workers:
+        atexit.register(_stop_workers)
+    stderr = tempfile.TemporaryFile()
+    worker = subprocess.Popen(
+        [sys.executable, "-u", _WORKER_SCRIPT],
+        text=True,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+    )
+    _workers.append(worker)
+    _worker_imports[worker] = set()
+    _worker_stderr[worker] = stderr
+    return worker
+
+
+def _read_worker_stderr(stderr: IO[bytes]) -> str:
+    """Return the end of what a worker wrote to stderr, and close the file."""
+    with stderr:
+        size = stderr.seek(0, os.SEEK_END)
+        stderr.seek(max(0, size - _WORKER_STDERR_TAIL))
+        return stderr.read().decode(errors="replace")
+
+
+def _prestart_worker() -> None:
+    """
+    Start a worker in the background if there isn't one, so it is importing pyinfra
+    while a pyinfra task runs its precheck and prepares the operation.
+
+    This is called by the tasks, rather than when a task module is imported, so
+    looking at the modules (like `dir()` or the `updocs` listing) doesn't start one.
+    """
+    with _workers_lock:
+        if not _workers:
+            _idle_workers.append(_start_worker())
+
+
+def _run_worker(
+    imports: Iterable[str],
+    operations: List[Tuple[str, str]],
+    output: Optional[Callable[[str], None]] = None,
+) -> List[str]:
+    """
+    Run pyinfra operations, in order, in a worker process.
+
+    An idle worker is used if there is one, otherwise a new one is started.  The
+    workers are stopped when uPlaybook exits.  Each worker keeps the imports it has
+    run, so only the imports it hasn't run yet are sent to it.
+
+    Args:
+        imports: The imports that the operators will need.
+        operations: The operators to run and their arguments, as for `_run_pyinfra()`.
+        output: If given, it is called with each line of output of the commands run,
+                as they run.  (optional, callable)
+
+    Returns:
+        The status of each operation that was run, "Success", "No changes" or "Error".
+        pyinfra stops at the first error, so the list may be shorter than `operations`.
+
+    Raises:
+        PyInfraFailed: If the worker is unable to run the operations.
+    """
+    with _workers_lock:
+        worker = _idle_workers.pop() if _idle_workers else _start_worker()
+
+    imported = _worker_imports[worker]
+    new_imports = [statement for statement in imports if statement not in imported]
+    request = {
+        "cwd": os.getcwd(),
+        "imports": new_imports,
+        "operations": operations,
+        "stream": output is not None,
+    }
+    try:
+        worker.stdin.write(json.dumps(request) + "\n")
+        worker.stdin.flush()
+    except BrokenPipeError:
+        #  The worker has exited, reading its output gets the end of file below
+        pass
+    for response in iter(worker.stdout.readline, ""):
+        response = json.loads(response)
+        if "output" not in response:
+            break
+        output(response["output"])
+    else:
+        returncode = worker.wait()
+        with _workers_lock:
+            _workers.remove(worker)
+            del _worker_imports[worker]
+            stderr = _worker_stderr.pop(worker)
+        raise PyInfraFailed(
+            f"Worker exited unexpectedly, code {returncode}.",
+            "",
+            _read_worker_stderr(stderr),
+        )
+
+    if "error" not in response:
+        imported.update(new_imports)
+    with _workers_lock:
+        _idle_workers.append(worker)
+
+    if "error" in response:
+        raise PyInfraFailed(response["error"], "", response["log"])
+    return response["statuses"]
+
+
+def _print_output(line: str) -> None:
+    """Display a line of output from a command pyinfra is running."""
+    up_context.console.print(line, style="dim", markup=False, highlight=False)
+
+
 def _run_pyinfra(
-    imports: str, operator: str, operargs: Dict[str, object]
+    imports: str, operator: str, operargs: str, stream: bool = False
 ) -> PyInfraResults:
     """
     Run a pyinfra operation.
@@ -48,83 +332,644 @@ def _run_pyinfra(
     Args:
         imports: The imports that the operator will need.
         operator: The name of the operator to run.
-        operargs: kwargs-style arguments to the operator, the value needs to be a
-                valid python value of the type appropraite for the argument.
+        operargs: The arguments to the operator, as Python source for keyword
+                arguments, for example "path='/tmp', present=True".
+        stream: Display the output of the commands run by the operator as they run,
+                to show the progress of long operations.  (bool, default False)
     """
-    operargs = operargs.copy()
-    operargs.update(pyinfra_global_args)
+    operargs = _with_global_args(operargs)
+    statuses = _run_worker(
+        [imports], [(operator, operargs)], _print_output if stream else None
+    )
+    return PyInfraResults.from_statuses(statuses)
 
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as tmp_file:
-        tmp_file.write(imports)
-        tmp_file.write("\n")
-        tmp_file.write(operator)
-        tmp_file.write("(")
-        for k, v in operargs.items():
-            tmp_file.write(f"{k}={v}, ")
-        tmp_file.write(")")
 
-        tmp_file.close()
+@dataclass(slots=True)
+class _QueuedOperation:
+    """
+    An operation in a `_PyinfraBatch`.
+    """
 
-        s = subprocess.run(
-            ["pyinfra", "@local", tmp_file.name], text=True, capture_output=True
-        )
+    imports: str
+    operator: str
+    operargs: str
+    ret: Return
+    cache_key: Optional[Tuple]
+    #  Absolute paths the operation changes, see `_PyinfraBatch.enqueue()`.
+    paths: Tuple[str, ...]
+    #  Start a new pyinfra run with this operation, see `_PyinfraBatch.enqueue()`.
+    new_run: bool
+    stream: bool
+    #  An earlier queued operation that ensures the same state, this is not run.
+    duplicate_of: Optional["_QueuedOperation"] = None
+
+
+def _overlapping(path1: str, path2: str) -> bool:
+    """Is one of the (absolute, normalized) paths the same as, or inside, the other?"""
+    return (
+        path1 == path2
+        or path1.startswith(path2.rstrip(os.sep) + os.sep)
+        or path2.startswith(path1.rstrip(os.sep) + os.sep)
+    )
+
+
+def _independent_lanes(
+    operations: List[_QueuedOperation],
+) -> List[List[_QueuedOperation]]:
+    """
+    Split operations into lanes that do not change any of the same paths.
+
+    Operations that change overlapping paths are in the same lane, in their original
+    order.  If any operation does not say what paths it changes, it could conflict
+    with any other, so all the operations are in one lane.
+    """
+    lanes: List[Tuple[List[str], List[_QueuedOperation]]] = []
+    for operation in operations:
+        if not operation.paths:
+            return [operations]
+        paths = list(operation.paths)
+        queued = [operation]
+        for lane in list(lanes):
+            lane_paths, lane_operations = lane
+            if any(_overlapping(p1, p2) for p1 in paths for p2 in lane_paths):
+                lanes.remove(lane)
+                paths += lane_paths
+                queued = lane_operations + queued
+        lanes.append((paths, queued))
+
+    order = {id(operation): i for i, operation in enumerate(operations)}
+    return [
+        sorted(lane_operations, key=lambda operation: order[id(operation)])
+        for _, lane_operations in lanes
+    ]
+
+
+class _PyinfraBatch:
+    """
+    pyinfra operations queued up to be run together in a single pyinfra run.
+
+    See `batch()`.
+    """
+
+    _current: ContextVar[Optional["_PyinfraBatch"]] = ContextVar(
+        "pyinfra_batch", default=None
+    )
+
+    def __init__(self, parallel: int = 1) -> None:
+        self.parallel = parallel
+        self.operations: List[_QueuedOperation] = []
+        #  Paths changed by the operations queued since the last new run, None if one
+        #  of them could change any path.
+        self.run_paths: Optional[Set[str]] = set()
+        #  Cacheable operations queued, by cache key, that later operations haven't
+        #  changed the paths of.
+        self.ensured: Dict[Tuple, _QueuedOperation] = {}
+        #  Cacheable operations run by this batch: (cwd, operator, operargs) -> the
+        #  number of changes made by the playbook when the operation was run.  Until
+        #  another change is made, running it again would make no change.
+        self.state_cache: Dict[Tuple[str, str, str], int] = {}
+        #  Facts gathered in this batch, see `_facts`.
+        self.fact_cache: Dict[Tuple, Tuple[int, Any]] = {}
 
-        os.remove(tmp_file.name)
+    @classmethod
+    def current(cls) -> Optional["_PyinfraBatch"]:
+        """The batch operations are being queued into, or None if not batching."""
+        return cls._current.get()
 
-        if s.returncode != 0:
-            raise PyInfraFailed(
-                f"Exit code {s.returncode}, expecting 0.", s.stdout, s.stderr
+    def enqueue(
+        self,
+        imports: str,
+        operator: str,
+        operargs: str,
+        ret: Return,
+        cache_key: Optional[Tuple] = None,
+        edits: Optional[str] = None,
+        paths: Tuple[str, ...] = (),
+        stream: bool = False,
+    ) -> None:
+        """
+        Queue an operation, `ret` is resolved with its result when the batch is flushed.
+
+        `operargs` must already include the global arguments, see `_with_global_args()`.
+
+        pyinfra looks at the contents of a file when an operation is added, before any
+        operations are run, so an edit to a file that an earlier queued operation
+        changes (or may change, if it doesn't say what paths it changes) would not see
+        that change.  Such an edit is put in a new pyinfra run, after the earlier one,
+        when the batch is flushed.
+
+        An operation that ensures the same state as an earlier queued one (the same
+        `cache_key`) is not run, unless an operation in between changes its paths.  It
+        is reported as unchanged, as it would be after the earlier one had run.
+
+        Args:
+            cache_key: If given, the result is recorded in `state_cache`.
+            edits: The file the operation edits the contents of.
+            paths: The paths the operation changes (including `edits`), operations
+                    changing unrelated paths can be run in parallel.  If any is
+                    None, the operation is treated as possibly changing any path.
+            stream: Display the output of the operation as it runs.
+        """
+        #  A path that isn't given (None) means the operation could change anything
+        if None in paths:
+            paths = ()
+        paths = tuple(os.path.abspath(path) for path in paths)
+
+        new_run = False
+        if edits is not None:
+            edits = os.path.abspath(edits)
+            new_run = self.run_paths is None or any(
+                _overlapping(edits, path) for path in self.run_paths
             )
+            if new_run:
+                self.run_paths = set()
+        if self.run_paths is not None:
+            self.run_paths = self.run_paths.union(paths) if paths else None
+        operation = _QueuedOperation(
+            imports, operator, operargs, ret, cache_key, paths, new_run, stream
+        )
+        self.operations.append(operation)
 
-        # [@local]   Changed: 0   No change: 1   Errors: 0
-        match = re.search(
-            r"\[@local\]\s+Changed:\s*(?P<changed>\d+)\s+No change:\s*(?P<no_change>\d+)\s+Errors:\s*(?P<errors>\d+)",
-            s.stderr,
+        if cache_key is not None and cache_key in self.ensured:
+            operation.duplicate_of = self.ensured[cache_key]
+            return
+        for key, ensured in list(self.ensured.items()):
+            if not paths or any(
+                _overlapping(p1, p2) for p1 in paths for p2 in ensured.paths
+            ):
+                del self.ensured[key]
+        if cache_key is not None:
+            self.ensured[cache_key] = operation
+
+    @staticmethod
+    def _run_lane(operations: List[_QueuedOperation]) -> List[str]:
+        """Run operations in a worker, returning their statuses."""
+        stream = any(operation.stream for operation in operations)
+        return _run_worker(
+            dict.fromkeys(operation.imports for operation in operations),
+            [(operation.operator, operation.operargs) for operation in operations],
+            _print_output if stream else None,
         )
-        if not match:
-            raise PyInfraFailed(
-                f"Unable to parse pyinfra output for 'Changed' message",
-                s.stdout,
-                s.stderr,
+
+    def _run_lanes(
+        self,
+        executor: ThreadPoolExecutor,
+        lanes: List[List[_QueuedOperation]],
+        statuses: Dict[int, str],
+    ) -> None:
+        """
+        Run lanes of operations, in parallel if there are several, adding their
+        statuses to `statuses`.
+
+        If a lane can't be run, the statuses of the other lanes are still added, and
+        then the first exception is raised.
+        """
+        if len(lanes) > 1:
+            results = [executor.submit(self._run_lane, lane).result for lane in lanes]
+        else:
+            results = [lambda: self._run_lane(lanes[0])]
+
+        first_exception = None
+        for lane, result in zip(lanes, results):
+            try:
+                lane_statuses = result()
+            except Exception as e:
+                if first_exception is None:
+                    first_exception = e
+                continue
+            for operation, status in zip(lane, lane_statuses):
+                statuses[id(operation)] = status
+        if first_exception is not None:
+            raise first_exception
+
+    def flush(self) -> None:
+        """
+        Run all the queued operations and resolve their Returns.
+
+        Every Return is resolved, even if resolving an earlier one raises (a failed
+        operation raises `Failure` unless failures are ignored), and then the first
+        exception is raised.  If pyinfra can't be run (`PyInfraFailed`), the operations
+        not run are resolved as failed and that exception is raised.
+        """
+        operations, self.operations = self.operations, []
+        self.run_paths = set()
+        self.ensured.clear()
+
+        runs: List[List[_QueuedOperation]] = []
+        for operation in operations:
+            if operation.duplicate_of is not None:
+                continue
+            if operation.new_run or not runs:
+                runs.append([])
+            runs[-1].append(operation)
+
+        statuses: Dict[int, str] = {}
+        #  If pyinfra can't be run, the operations run so far are still resolved, and
+        #  the rest are resolved as failed, before the exception is raised.
+        run_exception = None
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+                for run in runs:
+                    lanes = _independent_lanes(run) if self.parallel > 1 else [run]
+                    self._run_lanes(executor, lanes, statuses)
+
+                    #  pyinfra stops at the first failed operation, later ones are not
+                    #  run.
+                    if any(statuses.get(id(op), "Error") == "Error" for op in run):
+                        break
+        except Exception as e:
+            run_exception = e
+            self._resolve_not_run(
+                [
+                    operation
+                    for operation in operations
+                    if id(operation.duplicate_of or operation) not in statuses
+                ]
             )
 
-        groups = match.groupdict()
-        return PyInfraResults(
-            int(groups["changed"]),
-            int(groups["no_change"]),
-            int(groups["errors"]),
+        first_exception = run_exception
+        for operation in operations:
+            if operation.ret.pending is None:
+                continue
+            try:
+                if operation.duplicate_of is not None:
+                    status = statuses.get(id(operation.duplicate_of), "Error")
+                    operation.ret.resolve(
+                        changed=False,
+                        failure=status == "Error",
+                        extra_message="duplicate",
+                    )
+                    continue
+                status = statuses.get(id(operation), "Error")
+                operation.ret.resolve(
+                    changed=status == "Success", failure=status == "Error"
+                )
+            except Exception as e:
+                if first_exception is None:
+                    first_exception = e
+                continue
+            if operation.cache_key is not None and status != "Error":
+                self.state_cache[operation.cache_key] = up_context.changed_count
+        if first_exception is not None:
+            raise first_exception
+
+    def discard(self) -> None:
+        """
+        Drop the queued operations without running them.
+
+        Their Returns are resolved as failed, so using one later does not run it, long
+        after the code that queued it.  Used when the body of `batch()` raises, so the
+        exceptions from resolving them are suppressed in favour of that one.
+        """
+        operations, self.operations = self.operations, []
+        self.run_paths = set()
+        self.ensured.clear()
+        self._resolve_not_run(operations)
+
+    @staticmethod
+    def _resolve_not_run(operations: List[_QueuedOperation]) -> None:
+        """
+        Resolve the Returns of operations that were not run as failed.
+
+        The exceptions from resolving them are suppressed, in favour of the exception
+        that stopped them from being run.
+        """
+        for operation in operations:
+            try:
+                operation.ret.resolve(
+                    changed=False, failure=True, extra_message="not run"
+                )
+            except Exception:
+                pass
+
+
+def _pyinfra_return(
+    result: PyInfraResults,
+    changed: Optional[bool] = None,
+    extra_message: Optional[str] = None,
+) -> Return:
+    """
+    The Return of a task from the result of running its pyinfra operation.
+
+    Args:
+        result: The result of `_run_pyinfra()`.
+        changed: Override whether the task changed the system, by default it did if
+                any operation made a change.  (optional, bool)
+        extra_message: Displayed with the task status.  (optional, str)
+    """
+    if changed is None:
+        changed = result.changed != 0 and not result.errors
+    return Return(
+        changed=changed, failure=result.errors != 0, extra_message=extra_message
+    )
+
+
+def _nothing_queued() -> bool:
+    """
+    Are there no batched operations waiting to be run?
+
+    Operations queued in a batch may change the system when they are run, so the
+    system can only be inspected (or cached results trusted) if this is True.
+    """
+    batch = _PyinfraBatch.current()
+    return batch is None or not batch.operations
+
+
+def _run_operation(
+    imports: str,
+    operator: str,
+    operargs: str,
+    cacheable: bool = False,
+    edits: Optional[str] = None,
+    paths: Tuple[str, ...] = (),
+    stream: bool = False,
+) -> Return:
+    """
+    Run a pyinfra operation for a task, or queue it if a batch is active.
+
+    Args:
+        imports: The imports that the operator will need.
+        operator: The name of the operator to run.
+        operargs: The arguments to the operator, as for `_run_pyinfra()`.
+        cacheable: The operation only ensures a state (like a directory existing), so
+                once it has been run in a batch it does not need to be run again in
+                that batch until a task changes the system.  Outside of a batch it is
+                always run, as the playbook may have changed the system by other means.
+                (bool, default False)
+        edits: The file the operation edits the contents of, if any.  (optional, str)
+        paths: The paths the operation changes, other than `edits`, if known.  (tuple)
+        stream: Display the output of the operation as it runs, for long running
+                operations.  (bool, default False)
+
+    Returns:
+        The Return of the task, pending until the batch is flushed if batching.
+    """
+    batch = _PyinfraBatch.current()
+    #  The global arguments in effect are part of the operation, for the cache too
+    operargs = _with_global_args(operargs)
+
+    if batch is None:
+        statuses = _run_worker(
+            [imports], [(operator, operargs)], _print_output if stream else None
         )
+        return _pyinfra_return(PyInfraResults.from_statuses(statuses))
+
+    cache_key = None
+    if cacheable:
+        cache_key = (os.getcwd(), operator, operargs)
+        if (
+            _nothing_queued()
+            and batch.state_cache.get(cache_key) == up_context.changed_count
+        ):
+            return Return(changed=False, extra_message="cached")
+
+    ret = Return(changed=False, pending=batch.flush)
+    if edits is not None:
+        paths += (edits,)
+    batch.enqueue(imports, operator, operargs, ret, cache_key, edits, paths, stream)
+    return ret
+
+
+@contextmanager
+def batch(parallel: int = 1) -> Iterator[_PyinfraBatch]:
+    """
+    A context manager to run the enclosed pyinfra tasks in a single pyinfra run.
+
+    Starting pyinfra takes far longer than most operations, so running a group of
+    tasks together is much faster.  The tasks are queued and run, in order, at the end
+    of the context, or when the result of one of them is used (or `flush()` is called).
+    Their status is displayed when they are run.
+
+    Tasks that are not pyinfra tasks are run immediately, so the enclosed tasks should
+    not depend on them, or `flush()` the batch first.
+
+    Within a batch, a task that only ensures a state (like `files.directory()`) is not
+    run again with the same arguments until a task makes a change.  So the enclosed
+    code should not change what those tasks ensure by other means, such as `os.rmdir()`
+    or `core.run(..., change=False)`.
+
+    If the enclosed code raises an exception, the queued tasks are not run, and are
+    reported as failed.  A batch started inside another one first runs the tasks
+    queued in the outer batch, so tasks are always run in order.
+
+    Args:
+        parallel: Run up to this many groups of tasks at once, in separate pyinfra
+                processes.  Tasks are only run in parallel if they all say what paths
+                they change (currently the `files` tasks, `git.repo`, `git.bare_repo`
+                and the `pip` tasks given a virtualenv), and tasks changing the same
+                paths are run in order.
+                Each extra process takes a moment to start, so this pays off for slow
+                tasks such as `files.download` and `git.repo`.  (int, default 1)
+
+    Example:
+
+        with pyinfra.batch():
+            for path in ["/netboot/tftp", "/netboot/nfs"]:
+                pyinfra.files.directory(path=path)
+    """
+    outer = _PyinfraBatch.current()
+    if outer is not None:
+        outer.flush()
+
+    current = _PyinfraBatch(parallel=parallel)
+    token = _PyinfraBatch._current.set(current)
+    try:
+        try:
+            yield current
+        except BaseException:
+            current.discard()
+            raise
+        current.flush()
+    finally:
+        _PyinfraBatch._current.reset(token)
+
+
+def _pyinfra_task(
+    operator: str,
+    precheck: bool = False,
+    local_args: Tuple[str, ...] = (),
+    cacheable: Union[bool, str] = False,
+    edits: Optional[str] = None,
+    paths: Tuple[str, ...] = (),
+    stream: bool = False,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator to turn a stub function into a task that runs a pyinfra operator.
+
+    The decorated function only supplies the signature and docstring of the task.  A
+    function with the same signature is generated once, at import time, whose body
+    starts a worker (`_prestart_worker()`), collects the arguments into `operargs` and
+    runs `operator` via `_run_operation()`.
+    The generated function is wrapped with `task`.
+
+    Args:
+        operator: The pyinfra operator to run, as "module.operator".
+        precheck: If True, the body of the stub is run first, with the task arguments.
+                If it returns a `Return`, that is returned and pyinfra is not run,
+                allowing a task to skip pyinfra when the system is already in the
+                requested state.  (bool, default False)
+        local_args: Names of task arguments that are only used by uPlaybook (typically
+                by the precheck) and are not passed on to the operator.  (tuple of str)
+        cacheable: Passed to `_run_operation()`, either a bool or a Python expression
+                using the task arguments, like "not touch".  (default False)
+        edits: The name of the task argument with the file the operation edits, passed
+                to `_run_operation()`.  (optional, str)
+        paths: The names of the task arguments with the paths the operation changes,
+                passed to `_run_operation()`.  (tuple of str)
+        stream: Display the output of the operator as it runs, for operators that can
+                take a long time, passed to `_run_operation()`.  (bool, default False)
+
+    Example:
+
+        @_pyinfra_task("apt.update")
+        def update(cache_time=None):
+            \"\"\"Updates apt repositories.\"\"\"
+
+        @_pyinfra_task("files.file", cacheable="not touch", paths=("path",))
+        def file(path, present=True, touch=False):
+            \"\"\"Add/remove/update files.\"\"\"
+    """
+
+    def decorator(stub: Callable[..., Any]) -> Callable[..., Any]:
+        sig = inspect.signature(stub)
+        params = []
+        call_args = []
+        operargs = []
+        var_keyword = None
+        for param in sig.parameters.values():
+            params.append(
+                str(param.replace(default=param.empty, annotation=param.empty))
+            )
+            if param.kind == param.VAR_KEYWORD:
+                var_keyword = param.name
+                call_args.append(f"**{param.name}")
+            elif param.kind == param.VAR_POSITIONAL:
+                call_args.append(f"*{param.name}")
+            else:
+                call_args.append(f"{param.name}={param.name}")
+                if param.name not in local_args:
+                    operargs.append(f"{param.name}={{_operarg({param.name})}}")
+
+        lines = [
+            f"def {stub.__name__}({', '.join(params)}):",
+            "    _prestart_worker()",
+        ]
+        if precheck:
+            lines += [
+                f"    precheck_return = precheck({', '.join(call_args)})",
+                "    if precheck_return is not None:",
+                "        return precheck_return",
+            ]
+        lines.append(f'    operargs = f"{", ".join(operargs)}"')
+        if var_keyword:
+            lines.append(
+                f'    operargs = ", ".join([operargs] * bool(operargs)'
+                f' + [f"{{k}}={{_operarg(v)}}" for k, v in {var_keyword}.items()])'
+            )
+        run_args = ["imports", "operator", "operargs"]
+        if cacheable:
+            run_args.append(f"cacheable={cacheable}")
+        if edits:
+            run_args.append(f"edits={edits}")
+        if paths:
+            run_args.append(f"paths=({''.join(f'{path}, ' for path in paths)})")
+        if stream:
+            run_args.append("stream=True")
+        lines.append(f"    return _run_operation({', '.join(run_args)})")
+
+        namespace = {
+            "_operarg": _operarg,
+            "_prestart_worker": _prestart_worker,
+            "_run_operation": _run_operation,
+            "imports": sys.intern(
+                f"from pyinfra.operations import {operator.split('.')[0]}"
+            ),
+            "operator": operator,
+            "precheck": stub,
+        }
+        exec(compile("\n".join(lines), f"<pyinfra task {operator}>", "exec"), namespace)
+        func = namespace[stub.__name__]
+
+        func.__defaults__ = stub.__defaults__
+        func.__kwdefaults__ = stub.__kwdefaults__
+        func.__annotations__ = stub.__annotations__
+        func.__doc__ = stub.__doc__
+        func.__module__ = stub.__module__
+        func.__qualname__ = stub.__qualname__
+
+        return task(func)
+
+    return decorator
+
+
+def _path_age(path: str) -> float:
+    """
+    Return the number of seconds since `path` was last modified.
+
+    Returns infinity if the path does not exist, so it is always considered stale.
+    """
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return math.inf
+
+
+#  Task modules are imported on first access, so a playbook only pays the import cost
+#  for the modules it uses.
+_TASK_MODULES = frozenset(
+    [
+        "apk",
+        "apt",
+        "brew",
+        "bsdinit",
+        "choco",
+        "dnf",
+        "files",
+        "gem",
+        "git",
+        "iptables",
+        "launchd",
+        "lxd",
+        "mysql",
+        "npm",
+        "openrc",
+        "pacman",
+        "pip",
+        "pkg",
+        "pkgin",
+        "postgresql",
+        "puppet",
+        "server",
+        "ssh",
+        "systemd",
+        "sysvinit",
+        "upstart",
+        "vzctl",
+        "windows",
+        "windows_files",
+        "xbps",
+        "yum",
+        "zypper",
+    ]
+)
+
+__all__ = [
+    "PyInfraFailed",
+    "PyInfraResults",
+    "batch",
+    "global_args",
+    "pyinfra_global_args",
+] + sorted(_TASK_MODULES)
+
+
+def __getattr__(name: str) -> ModuleType:
+    """Import task modules on first access."""
+    if name not in _TASK_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{name}", __name__)
+    globals()[name] = module
+    return module
 
 
-from . import apk
-from . import apt
-from . import brew
-from . import bsdinit
-from . import choco
-from . import dnf
-from . import files
-from . import gem
-from . import git
-from . import iptables
-from . import launchd
-from . import lxd
-from . import mysql
-from . import npm
-from . import openrc
-from . import pacman
-from . import pip
-from . import pkg
-from . import pkgin
-from . import postgresql
-from . import puppet
-from . import server
-from . import ssh
-from . import systemd
-from . import sysvinit
-from . import upstart
-from . import vzctl
-from . import windows
-from . import windows_files
-from . import xbps
-from . import yum
-from . import zypper
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | _TASK_MODULES)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+Facts about the local system, so tasks can tell when pyinfra would have nothing to do.
+
+pyinfra gathers facts like these when it runs an operation, but running pyinfra just
+to find the system is already in the requested state costs far more than gathering
+the fact.  These use the same commands and parsing as the pyinfra facts, so they agree
+with pyinfra on what is there.  Within a `batch()` they are cached until a task
+changes the system.
+
+They are gathered as the invoking user, so tasks only use them when
+`_local_facts_apply()`.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Set
+import functools
+import json
+import os
+import re
+import shutil
+import subprocess
+
+from . import _PyinfraBatch
+from ..internals import up_context
+
+#  From pyinfra.facts.gem, pyinfra.facts.pacman and pyinfra.facts.pip
+_GEM_REGEX = re.compile(r"^([a-zA-Z0-9\-\+\_]+)\s\(([0-9\.]+)\)$")
+_PACMAN_REGEX = re.compile(r"^([0-9a-zA-Z\-]+)\s([0-9\._+a-z\-]+)")
+_PIP_REGEX = re.compile(r"^([a-zA-Z0-9_\-\+\.]+)==([0-9\.]+[a-z0-9\-]*)$")
+
+
+def _cached_fact(gather: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorator to cache a fact in the current batch, until a task makes a change.
+
+    Outside of a batch the fact is always gathered, as the playbook may have changed
+    the system by other means, see `batch()`.
+    """
+
+    @functools.wraps(gather)
+    def wrapper(*args: Any) -> Any:
+        batch = _PyinfraBatch.current()
+        if batch is None:
+            return gather(*args)
+        key = (gather.__name__,) + args
+        cached = batch.fact_cache.get(key)
+        if cached is not None and cached[0] == up_context.changed_count:
+            return cached[1]
+        fact = gather(*args)
+        batch.fact_cache[key] = (up_context.changed_count, fact)
+        return fact
+
+    return wrapper
+
+
+def _command_lines(
+    *command: str, env: Optional[Dict[str, str]] = None
+) -> Optional[List[str]]:
+    """
+    Run a command and return its output lines, stripped as pyinfra does.
+
+    `env` is added to the environment of the command.  Returns None if the command is
+    not installed or fails.
+    """
+    if shutil.which(command[0]) is None:
+        return None
+    if env:
+        env = {**os.environ, **env}
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, env=env)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    return [line.strip() for line in result.stdout.splitlines()]
+
+
+def _parse_packages(
+    regex: re.Pattern, lines: Optional[List[str]]
+) -> Optional[Dict[str, Set[str]]]:
+    """
+    Parse package listing lines into a dict of name to set of versions.
+    """
+    if lines is None:
+        return None
+    packages: Dict[str, Set[str]] = {}
+    for line in lines:
+        match = regex.match(line)
+        if match:
+            packages.setdefault(match.group(1), set()).add(match.group(2))
+    return packages
+
+
+@_cached_fact
+def gem_packages() -> Optional[Dict[str, Set[str]]]:
+    """
+    The installed gems, as a dict of name to set of versions.  (pyinfra GemPackages)
+    """
+    return _parse_packages(_GEM_REGEX, _command_lines("gem", "list", "--local"))
+
+
+@_cached_fact
+def iptables_chains(table: str, version: int) -> Optional[Dict[str, str]]:
+    """
+    The chains in an iptables table, as a dict of name to policy.  (pyinfra
+    IptablesChains and Ip6tablesChains)
+    """
+    command = "iptables-save" if version == 4 else "ip6tables-save"
+    lines = _command_lines(command, "-t", table)
+    if lines is None:
+        return None
+    chains = {}
+    for line in lines:
+        if line.startswith(":"):
+            name, policy, _ = line[1:].split()
+            chains[name] = policy
+    return chains
+
+
+@_cached_fact
+def launchd_status() -> Optional[Dict[str, bool]]:
+    """
+    Whether each launchd service is running.  (pyinfra LaunchdStatus)
+    """
+    lines = _command_lines("launchctl", "list")
+    if lines is None:
+        return None
+    services = {}
+    for line in lines:
+        bits = line.split()
+        if not bits or bits[0] == "PID":
+            continue
+        services[bits[2]] = bits[0].isdigit()
+    return services
+
+
+@_cached_fact
+def lxd_containers() -> Optional[List[Dict[str, Any]]]:
+    """
+    The LXD containers, as reported by ``lxc list``.  (pyinfra LxdContainers)
+    """
+    lines = _command_lines("lxc", "list", "--format", "json", "--fast")
+    if lines is None:
+        return None
+    try:
+        return json.loads("\n".join(lines))
+    except ValueError:
+        return None
+
+
+@_cached_fact
+def pacman_packages() -> Optional[Dict[str, Set[str]]]:
+    """
+    The installed pacman packages, as a dict of name to set of versions.  (pyinfra
+    PacmanPackages)
+    """
+    return _parse_packages(_PACMAN_REGEX, _command_lines("pacman", "-Q"))
+
+
+@_cached_fact
+def pip_packages(pip: str) -> Optional[Dict[str, Set[str]]]:
+    """
+    The packages installed by `pip`, as a dict of name to set of versions.  (pyinfra
+    PipPackages)
+    """
+    return _parse_packages(_PIP_REGEX, _command_lines(pip, "freeze", "--all"))
+
+
+@_cached_fact
+def postgresql_names(
+    kind: str,
+    user: Optional[str],
+    password: Optional[str],
+    host: Optional[str],
+    port: Optional[int],
+) -> Optional[Set[str]]:
+    """
+    The names of the PostgreSQL roles or databases, `kind` is "roles" or "databases".
+    (pyinfra PostgresqlRoles and PostgresqlDatabases)
+    """
+    column, table = {
+        "roles": ("rolname", "pg_roles"),
+        "databases": ("datname", "pg_database"),
+    }[kind]
+    command = ["psql"]
+    for flag, value in (("-U", user), ("-h", host), ("-p", port)):
+        if value:
+            command += [flag, str(value)]
+    command += ["-Ac", f"SELECT {column} FROM pg_catalog.{table}"]
+    lines = _command_lines(*command, env={"PGPASSWORD": password} if password else None)
+    #  A header line, a line per name, then the row count
+    if not lines or lines[0] != column:
+        return None
+    return set(lines[1:-1])
+
+
+def has_package(
+    installed: Dict[str, Set[str]], package: str, version_join: Optional[str]
+) -> bool:
+    """
+    Is `package` (optionally with a version, joined by `version_join`) installed?
+
+    This matches pyinfra's `ensure_packages()` check.
+    """
+    if version_join and version_join in package:
+        name, version = package.rsplit(version_join, 1)
+        return version in installed.get(name, ())
+    return package in installed
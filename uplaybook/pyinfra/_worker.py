@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+A long-running process that runs pyinfra operations for uPlaybook.
+
+Starting pyinfra and importing its operations takes far longer than running a typical
+operation, so uPlaybook starts this once and sends it all the operations to run.
+
+This is run as a script rather than imported as part of uplaybook, so it only loads
+pyinfra.  Requests are read from stdin and responses written to stdout, one JSON
+object per line.  A request is:
+
+    {"cwd": "/dir", "imports": ["from pyinfra.operations import files"],
+        "operations": [["files.directory", "path='/tmp/foo', present=True"]]}
+
+The imports are only sent in the first request that needs them, the names they
+import are kept for later requests.  The arguments of each operation are Python
+source for keyword arguments, values that have no Python literal form are given as
+_unpickle(b"...").  The operations are run in
+order against the local host, the response is:
+
+    {"statuses": ["Success"], "log": "..."}
+
+With a status of "Success", "No changes" or "Error" for each operation that was run
+(pyinfra stops at the first error).  If pyinfra could not run the operations, the
+response is {"error": "message", "log": "..."}.  The log is the tail of the pyinfra
+output, for error messages.
+
+If the request has "stream": true, the output of the commands pyinfra runs is sent
+line by line while they run, as {"output": "line"}, before the response.
+"""
+
+import os
+import sys
+
+#  As a script, this directory is first in the path, and the uPlaybook task modules in
+#  it (git, pip, server...) would shadow the top-level modules with the same names.
+if sys.path and sys.path[0] == os.path.dirname(os.path.abspath(__file__)):
+    del sys.path[0]
+
+from collections import deque
+from contextlib import redirect_stderr
+import functools
+import io
+import json
+import logging
+import pickle
+import re
+import traceback
+
+#  This uses the pyinfra 2.x API, pyinfra 3 moved and renamed these.
+from pyinfra.api import BaseStateCallback, Config, Inventory, State
+from pyinfra.api.connect import connect_all
+from pyinfra.api.exceptions import NoMoreHostsError
+from pyinfra.api.operation import add_op
+from pyinfra.api.operations import run_ops
+
+#  Number of lines of pyinfra output to keep for error messages.
+LOG_TAIL_LINES = 100
+
+#  pyinfra colors its output, which is removed from streamed output.
+ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_operation(operator: str, operargs: str) -> tuple:
+    """
+    Compile the expressions for an operator and its arguments.
+
+    Playbooks often repeat the same operation, in a loop or in a batch that is run
+    again, so the compiled code is kept rather than parsed again for each request.
+    """
+    return (
+        compile(operator, "<operator>", "eval"),
+        compile(f"dict({operargs})", "<operargs>", "eval"),
+    )
+
+
+class LogTail(logging.Handler):
+    """
+    Keep the last lines logged by pyinfra.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.lines = deque(maxlen=LOG_TAIL_LINES)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+class OutputStream(io.TextIOBase):
+    """
+    A stream that sends each line written to it as an {"output": line} message.
+
+    pyinfra writes command output to stderr, this replaces it while streaming.
+    """
+
+    def __init__(self, responses: io.TextIOBase) -> None:
+        self.responses = responses
+        self.partial = ""
+
+    def write(self, text: str) -> int:
+        *lines, self.partial = (self.partial + text).split("\n")
+        for line in lines:
+            line = ANSI_ESCAPE_RE.sub("", line)
+            self.responses.write(json.dumps({"output": line}) + "\n")
+        self.responses.flush()
+        return len(text)
+
+
+class OperationResults(BaseStateCallback):
+    """
+    Record which operations succeeded and failed.
+    """
+
+    def __init__(self) -> None:
+        self.success = set()
+        self.error = set()
+
+    def operation_host_success(self, state, host, op_hash):
+        self.success.add(op_hash)
+
+    def operation_host_error(self, state, host, op_hash):
+        self.error.add(op_hash)
+
+
+def run(request: dict, namespace: dict) -> dict:
+    """
+    Run the operations in `request` and return the response.
+
+    `namespace` is kept between requests, so the names imported by earlier requests
+    are available.
+    """
+    os.chdir(request["cwd"])
+    for imports in request["imports"]:
+        exec(imports, namespace)
+
+    inventory = Inventory((["@local"], {}))
+    state = State(inventory, Config())
+    state.print_output = request.get("stream", False)
+    results = OperationResults()
+    state.add_callback_handler(results)
+    connect_all(state)
+    host = inventory.get_host("@local")
+
+    metas = []
+    for operator, operargs in request["operations"]:
+        operator_code, operargs_code = compile_operation(operator, operargs)
+        kwargs = eval(operargs_code, namespace)
+        metas.append(add_op(state, eval(operator_code, namespace), **kwargs)[host])
+
+    try:
+        run_ops(state)
+    except NoMoreHostsError:
+        #  Raised when the host has failed, which shows up in the statuses
+        pass
+
+    statuses = []
+    for meta in metas:
+        if meta.hash in results.error:
+            statuses.append("Error")
+            break
+        if meta.hash not in results.success:
+            break
+        statuses.append("Success" if meta.changed else "No changes")
+    return {"statuses": statuses}
+
+
+def main() -> None:
+    #  Anything else written to stdout would corrupt the responses, so send it to stderr
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    log_tail = LogTail()
+    logger = logging.getLogger("pyinfra")
+    logger.addHandler(log_tail)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    namespace = {"_unpickle": pickle.loads}
+    for line in sys.stdin:
+        log_tail.lines.clear()
+        try:
+            request = json.loads(line)
+            if request.get("stream"):
+                with redirect_stderr(OutputStream(responses)):
+                    response = run(request, namespace)
+            else:
+                response = run(request, namespace)
+        except Exception:
+            response = {"error": traceback.format_exc()}
+        response["log"] = "\n".join(log_tail.lines)
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    main()
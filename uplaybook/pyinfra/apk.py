@@ -6,44 +6,26 @@
 This module provides tasks for interacting with the apk package manager.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("apk.upgrade")
 def upgrade(available=False):
     """
     Upgrades all apk packages.
 
     + available: force all packages to be upgraded (recommended on whole Alpine version upgrades)
     """
-    operargs = {
-        "available": repr(available),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import apk", "apk.upgrade", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("apk.update")
 def update():
     """
     Updates apk repositories.
     """
-    operargs = {}
-
-    result = _run_pyinfra("from pyinfra.operations import apk", "apk.update", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("apk.packages")
 def packages(packages=None, present=True, latest=False, update=False, upgrade=False):
     """
     Add/remove/update apk packages.
@@ -75,18 +57,3 @@ def packages(packages=None, present=True, latest=False, update=False, upgrade=Fa
             latest=True,
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "update": repr(update),
-        "upgrade": repr(upgrade),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import apk", "apk.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
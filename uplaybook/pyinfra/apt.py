@@ -6,12 +6,15 @@
 This module provides tasks for interacting with the apt package manager.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
+from . import _pyinfra_task, _path_age
 from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from ..internals import TemplateStr, Return
 
+#  Touched by apt (and pyinfra) after a successful "apt update".
+_UPDATE_STAMP = "/var/lib/apt/periodic/update-success-stamp"
 
-@task
+
+@_pyinfra_task("apt.packages")
 def packages(
     packages: Optional[List[TemplateStr]] = None,
     present: bool = True,
@@ -53,28 +56,9 @@ def packages(
     apt.packages(packages=["neovim"], latest=True)
     ```
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": present,
-        "latest": latest,
-        "update": update,
-        "upgrade": upgrade,
-        "force": force,
-        "no_recommends": no_recommends,
-        "allow_downgrades": allow_downgrades,
-        "cache_time": cache_time,
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import apt", "apt.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("apt.key")
 def key(src=None, keyserver=None, keyid=None):
     """
     Add apt gpg keys with ``apt-key``.
@@ -101,20 +85,9 @@ def key(src=None, keyserver=None, keyid=None):
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "keyserver": repr(keyserver),
-        "keyid": repr(keyid),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import apt", "apt.key", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("apt.repo")
 def repo(src, present=True, filename=None):
     """
     Add/remove apt repositories.
@@ -133,20 +106,9 @@ def repo(src, present=True, filename=None):
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-        "filename": repr(filename),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import apt", "apt.repo", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("apt.ppa")
 def ppa(src, present=True):
     """
     Add/remove Ubuntu ppa repositories.
@@ -167,19 +129,9 @@ def ppa(src, present=True):
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import apt", "apt.ppa", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("apt.deb")
 def deb(src, present=True, force=False):
     """
     Add/remove ``.deb`` file packages.
@@ -206,20 +158,9 @@ def deb(src, present=True, force=False):
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-        "force": repr(force),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import apt", "apt.deb", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("apt.update", precheck=True)
 def update(cache_time=None):
     """
     Updates apt repositories.
@@ -235,18 +176,11 @@ def update(cache_time=None):
     )
     ```
     """
-    operargs = {
-        "cache_time": repr(cache_time),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import apt", "apt.update", operargs)
+    if cache_time and _path_age(_UPDATE_STAMP) < cache_time:
+        return Return(changed=False, extra_message="cache is fresh")
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("apt.upgrade")
 def upgrade(auto_remove=False):
     """
     Upgrades all apt packages.
@@ -268,18 +202,9 @@ def upgrade(auto_remove=False):
     )
     ```
     """
-    operargs = {
-        "auto_remove": repr(auto_remove),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import apt", "apt.upgrade", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("apt.dist_upgrade")
 def dist_upgrade():
     """
     Updates all apt packages, employing dist-upgrade.
@@ -292,12 +217,3 @@ def dist_upgrade():
     )
     ```
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import apt", "apt.dist_upgrade", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -7,44 +7,49 @@
 Manage brew packages on mac/OSX. See https://brew.sh/
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task, _path_age
+from typing import Optional
+from ..internals import Return
+import os
+import platform
 
 
-@task
-def update():
+def _formula_cache_file() -> str:
     """
-    Updates brew repositories.
+    The formula list that "brew update" downloads, found without running brew.
     """
-    operargs = {}
+    cache_dir = os.environ.get("HOMEBREW_CACHE")
+    if not cache_dir:
+        if platform.system() == "Darwin":
+            cache_dir = os.path.expanduser("~/Library/Caches/Homebrew")
+        else:
+            cache_dir = os.path.join(
+                os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                "Homebrew",
+            )
+    return os.path.join(cache_dir, "api", "formula.jws.json")
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import brew", "brew.update", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+@_pyinfra_task("brew.update", precheck=True, local_args=("cache_time",))
+def update(cache_time: Optional[int] = None):
+    """
+    Updates brew repositories.
 
+    + cache_time: skip the update if the brew formula list was downloaded less than
+      this many seconds ago
+    """
+    if cache_time and _path_age(_formula_cache_file()) < cache_time:
+        return Return(changed=False, extra_message="cache is fresh")
 
-@task
+
+@_pyinfra_task("brew.upgrade")
 def upgrade():
     """
     Upgrades all brew packages.
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import brew", "brew.upgrade", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("brew.packages")
 def packages(packages=None, present=True, latest=False, update=False, upgrade=False):
     """
     Add/remove/update brew packages.
@@ -76,55 +81,21 @@ def packages(packages=None, present=True, latest=False, update=False, upgrade=Fa
             latest=True,
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "update": repr(update),
-        "upgrade": repr(upgrade),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import brew", "brew.packages", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("brew.cask_args")
 def cask_args(host):
-    operargs = {
-        "host": repr(host),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import brew", "brew.cask_args", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    ...
 
 
-@task
+@_pyinfra_task("brew.cask_upgrade")
 def cask_upgrade():
     """
     Upgrades all brew casks.
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import brew", "brew.cask_upgrade", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("brew.casks")
 def casks(casks=None, present=True, latest=False, upgrade=False):
     """
     Add/remove/update brew casks.
@@ -148,21 +119,9 @@ def casks(casks=None, present=True, latest=False, upgrade=False):
             latest=True,
         )
     """
-    operargs = {
-        "casks": repr(casks),
-        "present": repr(present),
-        "latest": repr(latest),
-        "upgrade": repr(upgrade),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import brew", "brew.casks", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("brew.tap")
 def tap(src, present=True):
     """
     Add/remove brew taps.
@@ -186,13 +145,3 @@ def tap(src, present=True):
                 src=tap,
             )
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import brew", "brew.tap", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -7,12 +7,10 @@
 Manage BSD init services (``/etc/rc.d``, ``/usr/local/etc/rc.d``).
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("bsdinit.service")
 def service(
     service, running=True, restarted=False, reloaded=False, command=None, enabled=None
 ):
@@ -26,19 +24,3 @@ def service(
     + command: custom command to pass like: ``/etc/rc.d/<service> <command>``
     + enabled: whether this service should be enabled/disabled on boot
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restarted": repr(restarted),
-        "reloaded": repr(reloaded),
-        "command": repr(command),
-        "enabled": repr(enabled),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import bsdinit", "bsdinit.service", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
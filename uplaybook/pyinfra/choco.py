@@ -7,12 +7,10 @@
 Manage ``choco`` (Chocolatey) packages (https://chocolatey.org).
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("choco.packages")
 def packages(packages=None, present=True, latest=False):
     """
     Add/remove/update ``choco`` packages.
@@ -35,32 +33,10 @@ def packages(packages=None, present=True, latest=False):
             packages=["notepadplusplus"],
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import choco", "choco.packages", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("choco.install")
 def install():
     """
     Install ``choco`` (Chocolatey).
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import choco", "choco.install", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
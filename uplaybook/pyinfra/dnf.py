@@ -7,12 +7,10 @@
 Manage dnf packages and repositories. Note that dnf package names are case-sensitive.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("dnf.key")
 def key(src):
     """
     Add dnf gpg keys with ``rpm``.
@@ -32,18 +30,9 @@ def key(src):
             src=f"https://download.docker.com/linux/{linux_id}/gpg",
         )
     """
-    operargs = {
-        "src": repr(src),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import dnf", "dnf.key", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("dnf.repo")
 def repo(
     src,
     present=True,
@@ -86,24 +75,9 @@ def repo(
             baseurl="https://download.docker.com/linux/centos/7/$basearch/stable",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-        "baseurl": repr(baseurl),
-        "description": repr(description),
-        "enabled": repr(enabled),
-        "gpgcheck": repr(gpgcheck),
-        "gpgkey": repr(gpgkey),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import dnf", "dnf.repo", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("dnf.rpm")
 def rpm(src, present=True):
     """
     Add/remove ``.rpm`` file packages.
@@ -125,33 +99,16 @@ def rpm(src, present=True):
            src=f"https://dl.fedoraproject.org/pub/epel/epel-release-latest-{major_centos_version}.noarch.rpm",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import dnf", "dnf.rpm", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("dnf.update")
 def update():
     """
     Updates all dnf packages.
     """
-    operargs = {}
-
-    result = _run_pyinfra("from pyinfra.operations import dnf", "dnf.update", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("dnf.packages")
 def packages(
     packages=None,
     present=True,
@@ -195,21 +152,3 @@ def packages(
             latest=True,
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "update": repr(update),
-        "clean": repr(clean),
-        "nobest": repr(nobest),
-        "extra_install_args": repr(extra_install_args),
-        "extra_uninstall_args": repr(extra_uninstall_args),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import dnf", "dnf.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
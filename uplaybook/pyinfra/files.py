@@ -6,12 +6,147 @@
 This module provides tasks for manipulating the filesystem.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import (
+    _local_facts_apply,
+    _nothing_queued,
+    _path_age,
+    _pyinfra_return,
+    _pyinfra_task,
+    _run_pyinfra,
+    PyInfraFailed,
+    PyInfraResults,
+)
+from typing import Dict, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+import filecmp
+import functools
+import hashlib
+import http.client
+import mmap
+import os
+import re
+import ssl
+import tempfile
+import urllib.request
+from ..internals import TemplateStr, Return
+
+_FILES_IMPORT = "from pyinfra.operations import files"
+
+#  Files at least this large are downloaded in this many parallel segments, if the
+#  server supports it.  See `_parallel_download()`.
+_PARALLEL_DOWNLOAD_MIN_SIZE = 16 * 1024 * 1024
+_PARALLEL_DOWNLOAD_SEGMENTS = 4
+#  Seconds to wait for the server before giving up on a parallel download.
+_PARALLEL_DOWNLOAD_TIMEOUT = 60
+
+
+def _checksums_match(path: str, checksums: Dict[str, str]) -> bool:
+    """
+    Does the file at `path` match all the `checksums` (hashlib algorithm name to
+    expected hex digest)?
+
+    The file is memory mapped, so hashlib reads it straight from the page cache rather
+    than through a buffered read loop.
+    """
+    digests = {name: hashlib.new(name) for name in checksums}
+    with open(path, "rb") as fp:
+        #  Empty files can't be mapped, but then there is nothing to hash either
+        if os.fstat(fp.fileno()).st_size:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for digest in digests.values():
+                    digest.update(data)
+    return all(
+        digests[name].hexdigest() == expected.lower()
+        for name, expected in checksums.items()
+    )
+
 
+def _parallel_download(
+    src: str,
+    dest: str,
+    checksums: Dict[str, str],
+    headers: Optional[Dict[str, str]],
+    insecure: bool,
+) -> bool:
+    """
+    Download a large file using parallel HTTP range requests.
 
-@task
+    Several connections are often much faster than the one that curl or wget would use.
+    The file is only put in place if it matches all the `checksums` (hashlib algorithm
+    name to expected hex digest).
+
+    Returns:
+        True if `dest` was downloaded.  False if the server doesn't support range
+        requests, the file is small, or anything goes wrong, leaving the download to
+        pyinfra (which will report any errors).
+    """
+    context = None
+    if insecure:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    headers = headers or {}
+    try:
+        request = urllib.request.Request(src, headers=headers, method="HEAD")
+        with urllib.request.urlopen(
+            request, context=context, timeout=_PARALLEL_DOWNLOAD_TIMEOUT
+        ) as response:
+            size = int(response.headers.get("Content-Length", 0))
+            accept_ranges = response.headers.get("Accept-Ranges") == "bytes"
+    except (OSError, ValueError, http.client.HTTPException):
+        return False
+    if not accept_ranges or size < _PARALLEL_DOWNLOAD_MIN_SIZE:
+        return False
+
+    def fetch(start: int) -> None:
+        end = min(start + segment_size, size) - 1
+        request = urllib.request.Request(
+            src, headers={**headers, "Range": f"bytes={start}-{end}"}
+        )
+        with urllib.request.urlopen(
+            request, context=context, timeout=_PARALLEL_DOWNLOAD_TIMEOUT
+        ) as response:
+            if response.status != 206:
+                raise OSError(f"Range request got status {response.status}")
+            offset = start
+            while chunk := response.read(1024 * 1024):
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+        if offset != end + 1:
+            raise OSError("Short read of download segment")
+
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(dest)), prefix=".download-"
+        )
+        try:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+            segment_size = -(-size // _PARALLEL_DOWNLOAD_SEGMENTS)
+            with ThreadPoolExecutor(_PARALLEL_DOWNLOAD_SEGMENTS) as executor:
+                list(executor.map(fetch, range(0, size, segment_size)))
+        finally:
+            os.close(fd)
+
+        if not _checksums_match(temp_path, checksums):
+            return False
+
+        #  mkstemp() creates the file private, give it the permissions curl/wget would
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, dest)
+        temp_path = None
+        return True
+    except (OSError, ValueError, http.client.HTTPException):
+        return False
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+
+@_pyinfra_task("files.download", precheck=True, paths=("dest",), stream=True)
 def download(
     src,
     dest,
@@ -52,31 +187,120 @@ def download(
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "cache_time": repr(cache_time),
-        "force": repr(force),
-        "sha256sum": repr(sha256sum),
-        "sha1sum": repr(sha1sum),
-        "md5sum": repr(md5sum),
-        "headers": repr(headers),
-        "insecure": repr(insecure),
+    checksums = {
+        name: checksum
+        for name, checksum in (
+            ("sha256", sha256sum),
+            ("sha1", sha1sum),
+            ("md5", md5sum),
+        )
+        if checksum
     }
+    #  An up to date file with the right checksums is left alone, as pyinfra would, but
+    #  without starting pyinfra.
+    if (
+        checksums
+        and not force
+        and os.path.isfile(dest)
+        and (not cache_time or _path_age(dest) <= cache_time)
+        and _nothing_queued()
+        and _checksums_match(dest, checksums)
+    ):
+        return Return(changed=False, extra_message="checksum matches")
+
+    if (
+        checksums
+        and src.startswith(("http://", "https://"))
+        and (force or not os.path.exists(dest))
+        and _nothing_queued()
+        and _local_facts_apply()
+        and _parallel_download(src, dest, checksums, headers, insecure)
+    ):
+        #  pyinfra only sets the owner and mode when it downloads the file itself
+        if user or group or mode:
+            result = _run_pyinfra(
+                _FILES_IMPORT,
+                "files.file",
+                f"path={dest!r}, user={user!r}, group={group!r}, mode={mode!r}",
+            )
+            return _pyinfra_return(
+                result, changed=True, extra_message="parallel download"
+            )
+        return Return(changed=True, extra_message="parallel download")
+
+
+#  The characters that are special in a grep basic regex, and those that are literal
+#  when escaped with a backslash.
+_GREP_SPECIAL = ".[\\*^$"
+_GREP_ESCAPABLE = ".[]\\*^$"
+
+
+@functools.lru_cache(maxsize=1024)
+def _grep_regex(pattern: str) -> Optional[re.Pattern]:
+    """
+    Translate a grep basic regular expression into a compiled (bytes) Python regex.
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.download", operargs
-    )
+    Only patterns made of literal text, escaped special characters, ".*", and "^"
+    and "$" anchors are translated, those mean the same to grep and Python.  Anything
+    else returns None, and is left to grep.
+    """
+    regex = []
+    i = 0
+    if pattern.startswith("^"):
+        regex.append("^")
+        i = 1
+    while i < len(pattern):
+        char, next_char = pattern[i], pattern[i + 1 : i + 2]
+        if char == "\\" and next_char and next_char in _GREP_ESCAPABLE:
+            regex.append(re.escape(next_char))
+            i += 2
+        elif pattern.startswith(".*", i):
+            regex.append(".*")
+            i += 2
+        elif char == "$" and i == len(pattern) - 1:
+            regex.append("$")
+            i += 1
+        elif char in _GREP_SPECIAL:
+            return None
+        else:
+            regex.append(re.escape(char))
+            i += 1
+    return re.compile("".join(regex).encode())
+
+
+def _grep_file(path: str, pattern: str) -> Optional[bool]:
+    """
+    Does any line of the file at `path` match the grep basic regex `pattern`?
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    Returns None if that can't be determined locally (see `_grep_regex()`).
+    """
+    regex = _grep_regex(pattern)
+    if regex is None:
+        return None
+    try:
+        with open(path, "rb") as fp:
+            lines = fp.read().split(b"\n")
+    except OSError:
+        return None
+    if lines[-1] == b"":
+        lines.pop()
+    return any(regex.search(line) for line in lines)
+
+
+def _line_pattern(line: str, escape_regex_characters: bool) -> str:
+    """
+    The pattern `files.line` matches lines with, as pyinfra builds it.
+    """
+    if escape_regex_characters:
+        line = re.sub(r"([\.\\\+\*\?\[\^\]\$\(\)\{\}\-])", r"\\\1", line)
+    if not line.startswith("^"):
+        line = f"^.*{line}"
+    if not line.endswith("$"):
+        line = f"{line}.*$"
+    return line
 
 
-@task
+@_pyinfra_task("files.line", precheck=True, edits="path")
 def line(
     path,
     line,
@@ -172,29 +396,23 @@ def line(
     )
     ```
     """
-    operargs = {
-        "path": repr(path),
-        "line": repr(line),
-        "present": repr(present),
-        "replace": repr(replace),
-        "flags": repr(flags),
-        "backup": repr(backup),
-        "interpolate_variables": repr(interpolate_variables),
-        "escape_regex_characters": repr(escape_regex_characters),
-        "assume_present": repr(assume_present),
-        "ensure_newline": repr(ensure_newline),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.line", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+    #  Where pyinfra would find there is nothing to do, do that without pyinfra.
+    #  Replacing lines depends on how pyinfra reads them, so is left to pyinfra.
+    if interpolate_variables or assume_present or (present and replace):
+        return None
+    if not _nothing_queued():
+        return None
+    if not os.path.isfile(path):
+        if present or os.path.exists(path):
+            return None
+        return Return(changed=False, extra_message="no file")
+
+    matches = _grep_file(path, _line_pattern(line, escape_regex_characters))
+    if matches is not None and matches == bool(present):
+        return Return(changed=False, extra_message="line matches")
+
+
+@_pyinfra_task("files.replace", precheck=True, edits="path")
 def replace(
     path,
     text=None,
@@ -230,26 +448,19 @@ def replace(
     )
     ```
     """
-    operargs = {
-        "path": repr(path),
-        "text": repr(text),
-        "replace": repr(replace),
-        "flags": repr(flags),
-        "backup": repr(backup),
-        "interpolate_variables": repr(interpolate_variables),
-        "match": repr(match),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.replace", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+    #  With no lines matching there is nothing to replace, so no need for pyinfra.
+    if (
+        text is not None
+        and replace is not None
+        and not interpolate_variables
+        and _nothing_queued()
+        and os.path.isfile(path)
+        and _grep_file(path, text) is False
+    ):
+        return Return(changed=False, extra_message="no match")
+
+
+@_pyinfra_task("files.sync", paths=("dest",), stream=True)
 def sync(
     src,
     dest,
@@ -296,42 +507,14 @@ def sync(
       excluding all directories matching a given name, however deep under ``src`` they are,
       can be done for example with ``exclude_dir=["__pycache__", "*/__pycache__"]``
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "dir_mode": repr(dir_mode),
-        "delete": repr(delete),
-        "exclude": repr(exclude),
-        "exclude_dir": repr(exclude_dir),
-        "add_deploy_dir": repr(add_deploy_dir),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.sync", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("files.show_rsync_warning")
 def show_rsync_warning():
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.show_rsync_warning", operargs
-    )
+    ...
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("files.rsync", paths=("dest",), stream=True)
 def rsync(src, dest, flags=["-ax", "--delete"]):
     """
     Use ``rsync`` to sync a local directory to the remote system. This operation will actually call
@@ -346,41 +529,14 @@ def rsync(src, dest, flags=["-ax", "--delete"]):
         When using SSH, the ``files.rsync`` operation only supports the ``sudo`` and ``sudo_user``
         global arguments.
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "flags": repr(flags),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.rsync", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("files._create_remote_dir")
 def _create_remote_dir(state, host, remote_filename, user, group):
-    operargs = {
-        "state": repr(state),
-        "host": repr(host),
-        "remote_filename": repr(remote_filename),
-        "user": repr(user),
-        "group": repr(group),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files._create_remote_dir", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    ...
 
 
-@task
+@_pyinfra_task("files.get", precheck=True, paths=("dest",))
 def get(src, dest, add_deploy_dir=True, create_local_dir=False, force=False):
     """
     Download a file from the remote system.
@@ -405,22 +561,29 @@ def get(src, dest, add_deploy_dir=True, create_local_dir=False, force=False):
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "add_deploy_dir": repr(add_deploy_dir),
-        "create_local_dir": repr(create_local_dir),
-        "force": repr(force),
-    }
+    if not force and _nothing_queued() and _same_contents(src, dest):
+        return Return(changed=False, extra_message="contents match")
 
-    result = _run_pyinfra("from pyinfra.operations import files", "files.get", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+def _same_contents(src: object, dest: str) -> bool:
+    """
+    Does `dest` (or the file in `dest` if it is a directory) have the contents of `src`?
+
+    The files are both local, so they can be compared directly rather than having pyinfra
+    checksum them.  Only the contents are compared, so this is only sufficient if
+    no owner or mode is requested.
+    """
+    if not isinstance(src, str):
+        return False
+    if os.path.isdir(dest):
+        dest = os.path.join(dest, os.path.basename(src))
+    try:
+        return filecmp.cmp(src, dest, shallow=False)
+    except OSError:
+        return False
 
 
-@task
+@_pyinfra_task("files.put", precheck=True, paths=("dest",))
 def put(
     src,
     dest,
@@ -479,26 +642,18 @@ def put(
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "add_deploy_dir": repr(add_deploy_dir),
-        "create_remote_dir": repr(create_remote_dir),
-        "force": repr(force),
-        "assume_exists": repr(assume_exists),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import files", "files.put", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+    if (
+        not force
+        and user is None
+        and group is None
+        and mode is None
+        and _nothing_queued()
+        and _same_contents(src, dest)
+    ):
+        return Return(changed=False, extra_message="contents match")
+
+
+@_pyinfra_task("files.template", paths=("dest",))
 def template(
     src, dest, user=None, group=None, mode=None, create_remote_dir=True, **data
 ):
@@ -575,61 +730,19 @@ def template(
     )
     ```
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "create_remote_dir": repr(create_remote_dir),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.template", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("files._validate_path")
 def _validate_path(path):
-    operargs = {
-        "path": repr(path),
-    }
+    ...
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files._validate_path", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("files._raise_or_remove_invalid_path")
 def _raise_or_remove_invalid_path(fs_type, path, force, force_backup, force_backup_dir):
-    operargs = {
-        "fs_type": repr(fs_type),
-        "path": repr(path),
-        "force": repr(force),
-        "force_backup": repr(force_backup),
-        "force_backup_dir": repr(force_backup_dir),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files",
-        "files._raise_or_remove_invalid_path",
-        operargs,
-    )
+    ...
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("files.link", cacheable=True, paths=("path",))
 def link(
     path,
     target=None,
@@ -693,30 +806,9 @@ def link(
     )
     ```
     """
-    operargs = {
-        "path": repr(path),
-        "target": repr(target),
-        "present": repr(present),
-        "assume_present": repr(assume_present),
-        "user": repr(user),
-        "group": repr(group),
-        "symbolic": repr(symbolic),
-        "create_remote_dir": repr(create_remote_dir),
-        "force": repr(force),
-        "force_backup": repr(force_backup),
-        "force_backup_dir": repr(force_backup_dir),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.link", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("files.file", cacheable="not touch", paths=("path",))
 def file(
     path,
     present=True,
@@ -765,30 +857,9 @@ def file(
     )
     ```
     """
-    operargs = {
-        "path": repr(path),
-        "present": repr(present),
-        "assume_present": repr(assume_present),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "touch": repr(touch),
-        "create_remote_dir": repr(create_remote_dir),
-        "force": repr(force),
-        "force_backup": repr(force_backup),
-        "force_backup_dir": repr(force_backup_dir),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.file", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("files.directory", cacheable=True, paths=("path",))
 def directory(
     path,
     present=True,
@@ -841,31 +912,9 @@ def directory(
         )
     ```
     """
-    operargs = {
-        "path": repr(path),
-        "present": repr(present),
-        "assume_present": repr(assume_present),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "recursive": repr(recursive),
-        "force": repr(force),
-        "force_backup": repr(force_backup),
-        "force_backup_dir": repr(force_backup_dir),
-        "_no_check_owner_mode": repr(_no_check_owner_mode),
-        "_no_fail_on_link": repr(_no_fail_on_link),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.directory", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("files.flags", cacheable=True, paths=("path",))
 def flags(path, flags=None, present=True):
     """
     Set/clear file flags.
@@ -893,22 +942,9 @@ def flags(path, flags=None, present=True):
     )
     ```
     """
-    operargs = {
-        "path": repr(path),
-        "flags": repr(flags),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.flags", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("files.block", edits="path")
 def block(
     path,
     content=None,
@@ -988,24 +1024,3 @@ def block(
     )
     ```
     """
-    operargs = {
-        "path": repr(path),
-        "content": repr(content),
-        "present": repr(present),
-        "line": repr(line),
-        "backup": repr(backup),
-        "escape_regex_characters": repr(escape_regex_characters),
-        "before": repr(before),
-        "after": repr(after),
-        "marker": repr(marker),
-        "begin": repr(begin),
-        "end": repr(end),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import files", "files.block", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
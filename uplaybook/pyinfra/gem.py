@@ -7,12 +7,11 @@
 Manage Ruby gem packages. (see https://rubygems.org/ )
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _facts, _local_facts_apply, _nothing_queued, _pyinfra_task
+from ..internals import Return
 
 
-@task
+@_pyinfra_task("gem.packages", precheck=True, cacheable="not latest", stream=True)
 def packages(packages=None, present=True, latest=False):
     """
     Add/remove/update gem packages.
@@ -34,16 +33,15 @@ def packages(packages=None, present=True, latest=False):
             packages=["rspec"],
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import gem", "gem.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    if latest or not _nothing_queued() or not _local_facts_apply():
+        return None
+    installed = _facts.gem_packages()
+    if installed is None:
+        return None
+    if isinstance(packages, str):
+        packages = [packages]
+    if all(
+        _facts.has_package(installed, package, ":") == bool(present)
+        for package in packages or []
+    ):
+        return Return(changed=False, extra_message="already in state")
@@ -6,12 +6,10 @@
 This module provides tasks for interfacing with git version control.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("git.config", cacheable=True)
 def config(key, value, multi_value=False, repo=None):
     """
     Manage git config for a repository or globally.
@@ -32,21 +30,9 @@ def config(key, value, multi_value=False, repo=None):
             repo="/usr/local/src/pyinfra",
         )
     """
-    operargs = {
-        "key": repr(key),
-        "value": repr(value),
-        "multi_value": repr(multi_value),
-        "repo": repr(repo),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import git", "git.config", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("git.repo", cacheable="not pull", paths=("dest",), stream=True)
 def repo(
     src,
     dest,
@@ -83,27 +69,9 @@ def repo(
             dest="/usr/local/src/pyinfra",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "branch": repr(branch),
-        "pull": repr(pull),
-        "rebase": repr(rebase),
-        "user": repr(user),
-        "group": repr(group),
-        "ssh_keyscan": repr(ssh_keyscan),
-        "update_submodules": repr(update_submodules),
-        "recursive_submodules": repr(recursive_submodules),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import git", "git.repo", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+
+
+@_pyinfra_task("git.worktree", cacheable="not pull")
 def worktree(
     worktree,
     repo=None,
@@ -224,32 +192,9 @@ def worktree(
             force=True,
         )
     """
-    operargs = {
-        "worktree": repr(worktree),
-        "repo": repr(repo),
-        "detached": repr(detached),
-        "new_branch": repr(new_branch),
-        "commitish": repr(commitish),
-        "pull": repr(pull),
-        "rebase": repr(rebase),
-        "from_remote_branch": repr(from_remote_branch),
-        "present": repr(present),
-        "assume_repo_exists": repr(assume_repo_exists),
-        "force": repr(force),
-        "user": repr(user),
-        "group": repr(group),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import git", "git.worktree", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+
+
+@_pyinfra_task("git.bare_repo", paths=("path",))
 def bare_repo(path, user=None, group=None, present=True):
     """
     Create bare git repositories.
@@ -268,17 +213,3 @@ def bare_repo(path, user=None, group=None, present=True):
             path="/home/git/test.git",
         )
     """
-    operargs = {
-        "path": repr(path),
-        "user": repr(user),
-        "group": repr(group),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import git", "git.bare_repo", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -6,13 +6,12 @@
 This module provides tasks for manipulating the system firewall.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _facts, _local_facts_apply, _nothing_queued, _pyinfra_task
+from ..internals import Return
 
 
-@task
-def chain(chain, present=True, table=filter, policy=None, version=4):
+@_pyinfra_task("iptables.chain", precheck=True)
+def chain(chain, present=True, table="filter", policy=None, version=4):
     """
     Add/remove/update iptables chains.
 
@@ -25,24 +24,20 @@ def chain(chain, present=True, table=filter, policy=None, version=4):
     Policy:
         These can only be applied to system chains (FORWARD, INPUT, OUTPUT, etc).
     """
-    operargs = {
-        "chain": repr(chain),
-        "present": repr(present),
-        "table": repr(table),
-        "policy": repr(policy),
-        "version": repr(version),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import iptables", "iptables.chain", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+    if not _nothing_queued() or not _local_facts_apply():
+        return None
+    chains = _facts.iptables_chains(table, version)
+    if chains is None:
+        return None
+    if present:
+        unchanged = chain in chains and (not policy or chains[chain] == policy)
+    else:
+        unchanged = chain not in chains
+    if unchanged:
+        return Return(changed=False, extra_message="already in state")
+
+
+@_pyinfra_task("iptables.rule")
 def rule(
     chain,
     jump,
@@ -116,36 +111,3 @@ def rule(
             to_destination="8.8.4.4:8080",
         )
     """
-    operargs = {
-        "chain": repr(chain),
-        "jump": repr(jump),
-        "present": repr(present),
-        "table": repr(table),
-        "append": repr(append),
-        "version": repr(version),
-        "protocol": repr(protocol),
-        "not_protocol": repr(not_protocol),
-        "source": repr(source),
-        "not_source": repr(not_source),
-        "destination": repr(destination),
-        "not_destination": repr(not_destination),
-        "in_interface": repr(in_interface),
-        "not_in_interface": repr(not_in_interface),
-        "out_interface": repr(out_interface),
-        "not_out_interface": repr(not_out_interface),
-        "to_destination": repr(to_destination),
-        "to_source": repr(to_source),
-        "to_ports": repr(to_ports),
-        "log_prefix": repr(log_prefix),
-        "destination_port": repr(destination_port),
-        "source_port": repr(source_port),
-        "extras": repr(extras),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import iptables", "iptables.rule", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -7,12 +7,11 @@
 Manage launchd services.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _facts, _local_facts_apply, _nothing_queued, _pyinfra_task
+from ..internals import Return
 
 
-@task
+@_pyinfra_task("launchd.service", precheck=True)
 def service(service, running=True, restarted=False, command=None):
     """
     Manage the state of systemd managed services.
@@ -23,17 +22,15 @@ def service(service, running=True, restarted=False, command=None):
     + command: custom command to pass like: ``launchctl <command> <service>``
     + enabled: whether this service should be enabled/disabled on boot
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restarted": repr(restarted),
-        "command": repr(command),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import launchd", "launchd.service", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    if (
+        restarted
+        or command is not None
+        or not _nothing_queued()
+        or not _local_facts_apply()
+    ):
+        return None
+    statuses = _facts.launchd_status()
+    if statuses is None or service not in statuses:
+        return None
+    if running is None or statuses[service] == running:
+        return Return(changed=False, extra_message="already in state")
@@ -6,28 +6,46 @@
 This module provides tasks for managing lxd containers.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _facts, _local_facts_apply, _nothing_queued, _pyinfra_task
+from ..internals import task, Return
+from types import SimpleNamespace
 
 
 @task
-def get_container_named(name, containers):
-    operargs = {
-        "name": repr(name),
-        "containers": repr(containers),
-    }
+def get_container_named(name, containers=None):
+    """
+    Look up an LXD container by name.
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import lxd", "lxd.get_container_named", operargs
-    )
+    The container (a dict, as listed by ``lxc list --format json``) is in
+    ``extra.container`` of the result, or None if there is no container with that name.
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    + name: name of the container
+    + containers: list of containers to search, by default the containers on this
+      system, listed with ``lxc list`` on every call (within a `pyinfra.batch()`,
+      listed once, and again only after a task has made a change)
 
+    **Example:**
 
-@task
+    .. code:: python
+
+        if lxd.get_container_named(name="ubuntu19").extra.container is None:
+            lxd.container(id="ubuntu19", image="ubuntu:19.10")
+    """
+    if containers is None:
+        containers = _facts.lxd_containers()
+        if containers is None:
+            return Return(
+                changed=False,
+                failure=True,
+                extra_message="unable to list containers",
+                extra=SimpleNamespace(container=None),
+            )
+
+    container = next((c for c in containers if c.get("name") == name), None)
+    return Return(changed=False, extra=SimpleNamespace(container=container))
+
+
+@_pyinfra_task("lxd.container", precheck=True)
 def container(id, present=True, image="ubuntu:16.04"):
     """
     Add/remove LXD containers.
@@ -49,16 +67,11 @@ def container(id, present=True, image="ubuntu:16.04"):
             image="ubuntu:19.10",
         )
     """
-    operargs = {
-        "id": repr(id),
-        "present": repr(present),
-        "image": repr(image),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import lxd", "lxd.container", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    if not _nothing_queued() or not _local_facts_apply():
+        return None
+    containers = _facts.lxd_containers()
+    if containers is None:
+        return None
+    exists = any(container.get("name") == id for container in containers)
+    if exists == bool(present):
+        return Return(changed=False, extra_message="already in state")
@@ -7,12 +7,10 @@
 Manage npm (aka node aka Node.js) packages.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("npm.packages", cacheable="not latest")
 def packages(packages=None, present=True, latest=False, directory=None):
     """
     Install/remove/update npm packages.
@@ -25,17 +23,3 @@ def packages(packages=None, present=True, latest=False, directory=None):
     Versions:
         Package versions can be pinned like npm: ``<pkg>@<version>``.
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "directory": repr(directory),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import npm", "npm.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
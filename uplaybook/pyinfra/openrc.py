@@ -7,12 +7,10 @@
 Manage OpenRC init services.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("openrc.service", cacheable="not (restarted or reloaded or command)")
 def service(
     service,
     running=True,
@@ -33,20 +31,3 @@ def service(
     + enabled: whether this service should be enabled/disabled on boot
     + runlevel: runlevel to manage services for
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restarted": repr(restarted),
-        "reloaded": repr(reloaded),
-        "command": repr(command),
-        "enabled": repr(enabled),
-        "runlevel": repr(runlevel),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import openrc", "openrc.service", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
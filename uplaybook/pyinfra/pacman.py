@@ -7,44 +7,25 @@
 Manage pacman packages. (Arch Linux package manager)
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _facts, _local_facts_apply, _nothing_queued, _pyinfra_task
+from ..internals import Return
 
 
-@task
+@_pyinfra_task("pacman.upgrade")
 def upgrade():
     """
     Upgrades all pacman packages.
     """
-    operargs = {}
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import pacman", "pacman.upgrade", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("pacman.update")
 def update():
     """
     Updates pacman repositories.
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import pacman", "pacman.update", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("pacman.packages", precheck=True, cacheable="not (update or upgrade)")
 def packages(packages=None, present=True, update=False, upgrade=False):
     """
     Add/remove pacman packages.
@@ -67,17 +48,21 @@ def packages(packages=None, present=True, update=False, upgrade=False):
             update=True,
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "update": repr(update),
-        "upgrade": repr(upgrade),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import pacman", "pacman.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    #  Removing can name a group, which pyinfra expands, so only installs are checked
+    if (
+        update
+        or upgrade
+        or not present
+        or not _nothing_queued()
+        or not _local_facts_apply()
+    ):
+        return None
+    installed = _facts.pacman_packages()
+    if installed is None:
+        return None
+    if isinstance(packages, str):
+        packages = [packages]
+    #  pyinfra doesn't split off versions for pacman, so "name=version" is never
+    #  found installed and is left to pyinfra
+    if all(_facts.has_package(installed, package, None) for package in packages or []):
+        return Return(changed=False, extra_message="already in state")
@@ -6,12 +6,12 @@
 This module provides tasks for interacting with pip packages.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _facts, _local_facts_apply, _nothing_queued, _pyinfra_task
+from ..internals import Return
+import os
 
 
-@task
+@_pyinfra_task("pip.virtualenv", cacheable=True, paths=("path",))
 def virtualenv(
     path, python=None, venv=False, site_packages=False, always_copy=False, present=True
 ):
@@ -33,25 +33,9 @@ def virtualenv(
             path="/usr/local/bin/venv",
         )
     """
-    operargs = {
-        "path": repr(path),
-        "python": repr(python),
-        "venv": repr(venv),
-        "site_packages": repr(site_packages),
-        "always_copy": repr(always_copy),
-        "present": repr(present),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import pip", "pip.virtualenv", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("pip.venv", cacheable=True, paths=("path",))
 def venv(path, python=None, site_packages=False, always_copy=False, present=True):
     """
     Add/remove Python virtualenvs.
@@ -70,22 +54,11 @@ def venv(path, python=None, site_packages=False, always_copy=False, present=True
             path="/usr/local/bin/venv",
         )
     """
-    operargs = {
-        "path": repr(path),
-        "python": repr(python),
-        "site_packages": repr(site_packages),
-        "always_copy": repr(always_copy),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import pip", "pip.venv", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task(
+    "pip.packages", precheck=True, cacheable="not latest", paths=("virtualenv",)
+)
 def packages(
     packages=None,
     present=True,
@@ -126,21 +99,25 @@ def packages(
             virtualenv="/usr/local/bin/venv",
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "requirements": repr(requirements),
-        "pip": repr(pip),
-        "virtualenv": repr(virtualenv),
-        "virtualenv_kwargs": repr(virtualenv_kwargs),
-        "extra_install_args": repr(extra_install_args),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import pip", "pip.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    if (
+        latest
+        or requirements is not None
+        or not _nothing_queued()
+        or not _local_facts_apply()
+    ):
+        return None
+    if virtualenv:
+        #  pyinfra creates the virtualenv if this doesn't exist
+        if not os.path.exists(os.path.join(virtualenv, "bin", "activate")):
+            return None
+        pip = os.path.join(os.path.abspath(virtualenv), "bin", pip)
+    installed = _facts.pip_packages(pip)
+    if installed is None:
+        return None
+    if isinstance(packages, str):
+        packages = [packages]
+    if all(
+        _facts.has_package(installed, package, "==") == bool(present)
+        for package in packages or []
+    ):
+        return Return(changed=False, extra_message="already in state")
@@ -7,9 +7,8 @@
 Manage BSD packages and repositories. Note that BSD package names are case-sensitive.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _run_operation
+from ..internals import task
 
 
 @task
@@ -39,16 +38,8 @@ def packages(packages=None, present=True, pkg_path=None):
             packages=["vim-addon-manager", "vim"],
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "pkg_path": repr(pkg_path),
-    }
+    operargs = f"packages={packages!r}, present={present!r}, pkg_path={pkg_path!r}"
 
-    result = _run_pyinfra(
+    return _run_operation(
         "from pyinfra.operations import pkg", "pkg.packages", operargs
     )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
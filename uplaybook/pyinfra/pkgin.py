@@ -7,44 +7,35 @@
 Manage pkgin packages.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task, _path_age
+from typing import Optional
+from ..internals import Return
 
+#  The pkgin database, which "pkgin update" rewrites, for pkgsrc in /usr/pkg and in
+#  /opt/pkg (macOS).
+_PKGIN_DBS = ("/var/db/pkgin/pkgin.db", "/opt/pkg/var/db/pkgin/pkgin.db")
 
-@task
+
+@_pyinfra_task("pkgin.upgrade")
 def upgrade():
     """
     Upgrades all pkgin packages.
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import pkgin", "pkgin.upgrade", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
-def update():
+@_pyinfra_task("pkgin.update", precheck=True, local_args=("cache_time",))
+def update(cache_time: Optional[int] = None):
     """
     Updates pkgin repositories.
-    """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import pkgin", "pkgin.update", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    + cache_time: skip the update if the pkgin database was written less than this
+      many seconds ago
+    """
+    if cache_time and min(map(_path_age, _PKGIN_DBS)) < cache_time:
+        return Return(changed=False, extra_message="cache is fresh")
 
 
-@task
+@_pyinfra_task("pkgin.packages", cacheable="not (latest or update or upgrade)")
 def packages(packages=None, present=True, latest=False, update=False, upgrade=False):
     """
     Add/remove/update pkgin packages.
@@ -73,18 +64,3 @@ def packages(packages=None, present=True, latest=False, update=False, upgrade=Fa
             latest=True,
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "update": repr(update),
-        "upgrade": repr(upgrade),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import pkgin", "pkgin.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
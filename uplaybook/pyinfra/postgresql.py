@@ -4,31 +4,61 @@
 ## Postgresql Database tasks
 
 This module provides tasks for working with PostgreSQL databases.
+
+To copy a database, `clone()` pipes `pg_dump` into `psql`, rather than using `dump()`
+and `load()` through an intermediate file.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import (
+    _facts,
+    _local_facts_apply,
+    _nothing_queued,
+    _operarg,
+    _pyinfra_task,
+    _run_operation,
+)
+from typing import Optional
+from ..internals import task, Return
+import re
 
+#  PostgreSQL truncates longer identifiers, so the role or database would never be
+#  found by name afterwards.
+_MAX_IDENTIFIER_BYTES = 63
 
-@task
-def _translate_legacy_args(func):
-    operargs = {
-        "func": repr(func),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import postgresql",
-        "postgresql._translate_legacy_args",
-        operargs,
-    )
+#  pyinfra puts the encoding into the SQL as-is, optionally quoted.
+_ENCODING_RE = re.compile(r"^'?[A-Za-z0-9_-]+'?$")
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
+def _invalid_argument(**arguments: Optional[str]) -> Optional[Return]:
+    """
+    Check the names and encoding given to `role()` and `database()` before pyinfra
+    runs psql, so bad values fail without connecting to PostgreSQL.
 
-@task
+    Returns a failed Return if one of the values is invalid, otherwise None.
+    """
+    for name, value in arguments.items():
+        if value is None:
+            continue
+        if name == "encoding":
+            valid = bool(_ENCODING_RE.match(value))
+        else:
+            #  pyinfra double-quotes names, so anything else is allowed
+            valid = (
+                value != ""
+                and '"' not in value
+                and "\0" not in value
+                and len(value.encode()) <= _MAX_IDENTIFIER_BYTES
+            )
+        if not valid:
+            return Return(
+                changed=False,
+                failure=True,
+                extra_message=f"invalid {name} {value!r}",
+            )
+    return None
+
+
+@_pyinfra_task("postgresql.sql")
 def sql(
     sql,
     database=None,
@@ -44,25 +74,9 @@ def sql(
     + database: optional database to execute against
     + psql_*: global module arguments, see above
     """
-    operargs = {
-        "sql": repr(sql),
-        "database": repr(database),
-        "psql_user": repr(psql_user),
-        "psql_password": repr(psql_password),
-        "psql_host": repr(psql_host),
-        "psql_port": repr(psql_port),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import postgresql", "postgresql.sql", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("postgresql.role", precheck=True, cacheable=True)
 def role(
     role,
     present=True,
@@ -112,33 +126,23 @@ def role(
             sudo_user="postgres",
         )
     """
-    operargs = {
-        "role": repr(role),
-        "present": repr(present),
-        "password": repr(password),
-        "login": repr(login),
-        "superuser": repr(superuser),
-        "inherit": repr(inherit),
-        "createdb": repr(createdb),
-        "createrole": repr(createrole),
-        "replication": repr(replication),
-        "connection_limit": repr(connection_limit),
-        "psql_user": repr(psql_user),
-        "psql_password": repr(psql_password),
-        "psql_host": repr(psql_host),
-        "psql_port": repr(psql_port),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import postgresql", "postgresql.role", operargs
+    invalid = _invalid_argument(role=role)
+    if invalid is not None:
+        return invalid
+
+    #  pyinfra only creates or drops roles, it does not change existing ones.  psql
+    #  is run as the invoking user, so skip this when pyinfra would run it as another
+    #  (like ``_sudo_user="postgres"``), which may connect as another role.
+    if not _nothing_queued() or not _local_facts_apply():
+        return None
+    names = _facts.postgresql_names(
+        "roles", psql_user, psql_password, psql_host, psql_port
     )
+    if names is not None and (role in names) == bool(present):
+        return Return(changed=False, extra_message="already in state")
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("postgresql.database", precheck=True, cacheable=True)
 def database(
     database,
     present=True,
@@ -185,32 +189,23 @@ def database(
             sudo_user="postgres",
         )
     """
-    operargs = {
-        "database": repr(database),
-        "present": repr(present),
-        "owner": repr(owner),
-        "template": repr(template),
-        "encoding": repr(encoding),
-        "lc_collate": repr(lc_collate),
-        "lc_ctype": repr(lc_ctype),
-        "tablespace": repr(tablespace),
-        "connection_limit": repr(connection_limit),
-        "psql_user": repr(psql_user),
-        "psql_password": repr(psql_password),
-        "psql_host": repr(psql_host),
-        "psql_port": repr(psql_port),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import postgresql", "postgresql.database", operargs
+    invalid = _invalid_argument(database=database, owner=owner, encoding=encoding)
+    if invalid is not None:
+        return invalid
+
+    #  pyinfra only creates or drops databases, it does not change existing ones.  psql
+    #  is run as the invoking user, so skip this when pyinfra would run it as another
+    #  (like ``_sudo_user="postgres"``), which may connect as another role.
+    if not _nothing_queued() or not _local_facts_apply():
+        return None
+    names = _facts.postgresql_names(
+        "databases", psql_user, psql_password, psql_host, psql_port
     )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    if names is not None and (database in names) == bool(present):
+        return Return(changed=False, extra_message="already in state")
 
 
-@task
+@_pyinfra_task("postgresql.dump")
 def dump(
     dest,
     database=None,
@@ -237,25 +232,9 @@ def dump(
             sudo_user="postgres",
         )
     """
-    operargs = {
-        "dest": repr(dest),
-        "database": repr(database),
-        "psql_user": repr(psql_user),
-        "psql_password": repr(psql_password),
-        "psql_host": repr(psql_host),
-        "psql_port": repr(psql_port),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import postgresql", "postgresql.dump", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("postgresql.load")
 def load(
     src,
     database=None,
@@ -282,34 +261,59 @@ def load(
             sudo_user="postgres",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "database": repr(database),
-        "psql_user": repr(psql_user),
-        "psql_password": repr(psql_password),
-        "psql_host": repr(psql_host),
-        "psql_port": repr(psql_port),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import postgresql", "postgresql.load", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
 @task
-def decorated_func(*args, **kwargs):
-    operargs = {}
+def clone(
+    src_database,
+    dest_database,
+    psql_user=None,
+    psql_password=None,
+    psql_host=None,
+    psql_port=None,
+):
+    """
+    Copy a database into another, by piping ``pg_dump`` into ``psql``.
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import postgresql",
-        "postgresql.decorated_func",
-        operargs,
+    This is the same as `dump()` followed by `load()`, without writing the dump to
+    disk.  The destination database must already exist.  Requires ``pg_dump`` and
+    ``bash``.  The task fails if ``pg_dump`` fails or the SQL fails to load.
+
+    + src_database: name of the database to copy
+    + dest_database: name of the database to load the copy into
+    + psql_*: global module arguments, see above
+
+    **Example:**
+
+    .. code:: python
+
+        postgresql.clone(
+            src_database="pyinfra_stuff",
+            dest_database="pyinfra_stuff_copy",
+        )
+    """
+    connection = (
+        f"user={_operarg(psql_user)}, "
+        f"password={_operarg(psql_password)}, "
+        f"host={_operarg(psql_host)}, "
+        f"port={_operarg(psql_port)}"
+    )
+    #  Run under bash with pipefail so a failing pg_dump fails the task, rather than
+    #  psql loading the empty input, and stop psql at the first SQL error.
+    operargs = (
+        "commands=[StringCommand('bash', '-c', QuoteString(StringCommand("
+        "'set -o pipefail;', "
+        f"make_psql_command(executable='pg_dump', database={_operarg(src_database)}, "
+        f"{connection}), '|', "
+        f"make_psql_command(database={_operarg(dest_database)}, {connection}), "
+        "'-v ON_ERROR_STOP=1')))]"
     )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation(
+        "from pyinfra.api import StringCommand\n"
+        "from pyinfra.api.command import QuoteString\n"
+        "from pyinfra.facts.postgresql import make_psql_command\n"
+        "from pyinfra.operations import server",
+        "server.shell",
+        operargs,
+    )
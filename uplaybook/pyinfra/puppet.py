@@ -6,18 +6,26 @@
 
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task, _path_age
+from typing import Optional
+from ..internals import Return
 
+#  Where the agent records its last run, for the puppetlabs and distro packages.
+_LAST_RUN_SUMMARIES = (
+    "/opt/puppetlabs/puppet/cache/state/last_run_summary.yaml",
+    "/var/lib/puppet/state/last_run_summary.yaml",
+)
 
-@task
-def agent(server=None, port=None):
+
+@_pyinfra_task("puppet.agent", precheck=True, local_args=("min_interval",))
+def agent(server=None, port=None, min_interval: Optional[int] = None):
     """
     Run puppet agent
 
     + server: master server URL
     + port: puppet master port
+    + min_interval: skip the run if the agent last ran less than this many seconds
+      ago
 
     Note: Either 'USE_SUDO_LOGIN=True' or 'USE_SU_LOGIN=True'
     for puppet.agent() as `puppet` is added to the path in
@@ -36,15 +44,5 @@ def agent(server=None, port=None):
             success_exit_codes=[0, 2],
         )
     """
-    operargs = {
-        "server": repr(server),
-        "port": repr(port),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import puppet", "puppet.agent", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    if min_interval and min(map(_path_age, _LAST_RUN_SUMMARIES)) < min_interval:
+        return Return(changed=False, extra_message="ran recently")
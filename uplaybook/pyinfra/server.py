@@ -6,12 +6,10 @@
 This module provides tasks for working with OS services.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("server.reboot")
 def reboot(delay=10, interval=1, reboot_timeout=300):
     """
     Reboot the server and wait for reconnection.
@@ -30,22 +28,9 @@ def reboot(delay=10, interval=1, reboot_timeout=300):
             reboot_timeout=600,
         )
     """
-    operargs = {
-        "delay": repr(delay),
-        "interval": repr(interval),
-        "reboot_timeout": repr(reboot_timeout),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.reboot", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("server.wait")
 def wait(port):
     """
     Waits for a port to come active on the target machine. Requires netstat, checks every
@@ -62,20 +47,9 @@ def wait(port):
             port=80,
         )
     """
-    operargs = {
-        "port": repr(port),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.wait", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("server.shell")
 def shell(commands):
     """
     Run raw shell code on server during a deploy. If the command would
@@ -93,20 +67,9 @@ def shell(commands):
             commands=["lxd init --auto"],
         )
     """
-    operargs = {
-        "commands": repr(commands),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.shell", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("server.script")
 def script(src, args=()):
     """
     Upload and execute a local script on the remote host.
@@ -131,21 +94,9 @@ def script(src, args=()):
             args=("do-something", "with-this"),
         )
     """
-    operargs = {
-        "src": repr(src),
-        "args": repr(args),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.script", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("server.script_template")
 def script_template(src, args=(), **data):
     """
     Generate, upload and execute a local script template on the remote host.
@@ -167,21 +118,9 @@ def script_template(src, args=(), **data):
             some_var=some_var,
         )
     """
-    operargs = {
-        "src": repr(src),
-        "args": repr(args),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.script_template", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("server.modprobe", cacheable=True)
 def modprobe(module, present=True, force=False):
     """
     Load/unload kernel modules.
@@ -199,22 +138,9 @@ def modprobe(module, present=True, force=False):
             module="floppy",
         )
     """
-    operargs = {
-        "module": repr(module),
-        "present": repr(present),
-        "force": repr(force),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.modprobe", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("server.mount", cacheable=True)
 def mount(path, mounted=True, options=None, device=None, fs_type=None):
     """
     Manage mounted filesystems.
@@ -231,24 +157,9 @@ def mount(path, mounted=True, options=None, device=None, fs_type=None):
         This operation does not attempt to modify the on disk fstab file - for
         that you should use the `files.line operation <./files.html#files-line>`_.
     """
-    operargs = {
-        "path": repr(path),
-        "mounted": repr(mounted),
-        "options": repr(options),
-        "device": repr(device),
-        "fs_type": repr(fs_type),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.mount", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("server.hostname", cacheable=True)
 def hostname(hostname, hostname_file=None):
     """
     Set the system hostname using ``hostnamectl`` or ``hostname`` on older systems.
@@ -274,21 +185,9 @@ def hostname(hostname, hostname_file=None):
             hostname="server1.example.com",
         )
     """
-    operargs = {
-        "hostname": repr(hostname),
-        "hostname_file": repr(hostname_file),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.hostname", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("server.sysctl", cacheable=True)
 def sysctl(key, value, persist=False, persist_file="/etc/sysctl.conf"):
     """
     Edit sysctl configuration.
@@ -309,23 +208,9 @@ def sysctl(key, value, persist=False, persist_file="/etc/sysctl.conf"):
             persist=True,
         )
     """
-    operargs = {
-        "key": repr(key),
-        "value": repr(value),
-        "persist": repr(persist),
-        "persist_file": repr(persist_file),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.sysctl", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("server.service", cacheable="not (restarted or reloaded or command)")
 def service(
     service, running=True, restarted=False, reloaded=False, command=None, enabled=None
 ):
@@ -350,25 +235,9 @@ def service(
             enabled=True,
         )
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restarted": repr(restarted),
-        "reloaded": repr(reloaded),
-        "command": repr(command),
-        "enabled": repr(enabled),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.service", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("server.packages", cacheable=True)
 def packages(packages, present=True):
     """
     Add or remove system packages. This command checks for the presence of all the
@@ -386,21 +255,9 @@ def packages(packages, present=True):
             packages=["vimpager", "vim"],
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("server.crontab", cacheable=True)
 def crontab(
     command,
     present=True,
@@ -452,30 +309,9 @@ def crontab(
             minute=0,
         )
     """
-    operargs = {
-        "command": repr(command),
-        "present": repr(present),
-        "user": repr(user),
-        "cron_name": repr(cron_name),
-        "minute": repr(minute),
-        "hour": repr(hour),
-        "month": repr(month),
-        "day_of_week": repr(day_of_week),
-        "day_of_month": repr(day_of_month),
-        "special_time": repr(special_time),
-        "interpolate_variables": repr(interpolate_variables),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.crontab", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+
+
+@_pyinfra_task("server.group", cacheable=True)
 def group(group, present=True, system=False, gid=None):
     """
     Add/remove system groups.
@@ -504,23 +340,9 @@ def group(group, present=True, system=False, gid=None):
                 group=group,
             )
     """
-    operargs = {
-        "group": repr(group),
-        "present": repr(present),
-        "system": repr(system),
-        "gid": repr(gid),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.group", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("server.user_authorized_keys", cacheable=True)
 def user_authorized_keys(
     user,
     public_keys,
@@ -551,25 +373,9 @@ def user_authorized_keys(
             public_keys=["ed25519..."],
         )
     """
-    operargs = {
-        "user": repr(user),
-        "public_keys": repr(public_keys),
-        "group": repr(group),
-        "delete_keys": repr(delete_keys),
-        "authorized_key_directory": repr(authorized_key_directory),
-        "authorized_key_filename": repr(authorized_key_filename),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.user_authorized_keys", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("server.user", cacheable=True)
 def user(
     user,
     present=True,
@@ -640,34 +446,9 @@ def user(
                 present=False,
             )
     """
-    operargs = {
-        "user": repr(user),
-        "present": repr(present),
-        "home": repr(home),
-        "shell": repr(shell),
-        "group": repr(group),
-        "groups": repr(groups),
-        "public_keys": repr(public_keys),
-        "delete_keys": repr(delete_keys),
-        "ensure_home": repr(ensure_home),
-        "create_home": repr(create_home),
-        "system": repr(system),
-        "uid": repr(uid),
-        "comment": repr(comment),
-        "add_deploy_dir": repr(add_deploy_dir),
-        "unique": repr(unique),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.user", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+
+
+@_pyinfra_task("server.locale", cacheable=True)
 def locale(locale, present=True):
     """
     Enable/Disable locale.
@@ -690,97 +471,44 @@ def locale(locale, present=True):
             locale="en_GB.UTF-8",
         )
     """
-    operargs = {
-        "locale": repr(locale),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.locale", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
+def partition(predicate, iterable):
+    """
+    Split `iterable` into the items that match `predicate` and those that don't.
 
-@task
-def remove_any_askpass_file(state, host):
-    operargs = {
-        "state": repr(state),
-        "host": repr(host),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server",
-        "server.remove_any_askpass_file",
-        operargs,
-    )
+    This is the helper `server.modprobe` uses, run locally; it is not a task.
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    + predicate: function called with each item
+    + iterable: the items to split
 
+    **Example:**
 
-@task
-def wait_and_reconnect(state, host):
-    operargs = {
-        "state": repr(state),
-        "host": repr(host),
-    }
+    .. code:: python
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.wait_and_reconnect", operargs
-    )
+        present, missing = server.partition(lambda m: m in loaded, ["nfs", "nfsd"])
+    """
+    matching, rest = [], []
+    for item in iterable:
+        (matching if predicate(item) else rest).append(item)
+    return matching, rest
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
+def comma_sep(value):
+    """
+    Join a list or tuple with commas, as `server.crontab` does for its time fields.
+    Other values are returned as-is.
 
-@task
-def partition(predicate, iterable):
-    operargs = {
-        "predicate": repr(predicate),
-        "iterable": repr(iterable),
-    }
+    This is run locally; it is not a task.
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.partition", operargs
-    )
+    + value: the list, tuple or value to join
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    **Example:**
 
+    .. code:: python
 
-@task
-def comma_sep(value):
-    operargs = {
-        "value": repr(value),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server", "server.comma_sep", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
-def read_any_pub_key_file(key):
-    operargs = {
-        "key": repr(key),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import server",
-        "server.read_any_pub_key_file",
-        operargs,
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+        server.comma_sep([0, 30])  # "0,30"
+    """
+    if isinstance(value, (list, tuple)):
+        return ",".join(f"{v}" for v in value)
+    return value
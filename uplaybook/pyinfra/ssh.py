@@ -6,12 +6,10 @@
 This module provides tasks for using SSH to copy files to/from remote machines and running commands.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("ssh.keyscan", cacheable="not force")
 def keyscan(hostname, force=False, port=22):
     """
     Check/add hosts to the ``~/.ssh/known_hosts`` file.
@@ -28,20 +26,9 @@ def keyscan(hostname, force=False, port=22):
             hostname="two.example.com",
         )
     """
-    operargs = {
-        "hostname": repr(hostname),
-        "force": repr(force),
-        "port": repr(port),
-    }
 
-    result = _run_pyinfra("from pyinfra.operations import ssh", "ssh.keyscan", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("ssh.command")
 def command(hostname, command, user=None, port=22):
     """
     Execute commands on other servers over SSH.
@@ -62,21 +49,9 @@ def command(hostname, command, user=None, port=22):
             user="vagrant",
         )
     """
-    operargs = {
-        "hostname": repr(hostname),
-        "command": repr(command),
-        "user": repr(user),
-        "port": repr(port),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import ssh", "ssh.command", operargs)
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("ssh.upload")
 def upload(
     hostname,
     filename,
@@ -97,24 +72,9 @@ def upload(
     + use_remote_sudo: upload to a temporary location and move using sudo
     + ssh_keyscan: execute ``ssh.keyscan`` before uploading the file
     """
-    operargs = {
-        "hostname": repr(hostname),
-        "filename": repr(filename),
-        "remote_filename": repr(remote_filename),
-        "port": repr(port),
-        "user": repr(user),
-        "use_remote_sudo": repr(use_remote_sudo),
-        "ssh_keyscan": repr(ssh_keyscan),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import ssh", "ssh.upload", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("ssh.download", cacheable="not force")
 def download(
     hostname,
     filename,
@@ -135,20 +95,3 @@ def download(
     + user: connect with this user
     + ssh_keyscan: execute ``ssh.keyscan`` before uploading the file
     """
-    operargs = {
-        "hostname": repr(hostname),
-        "filename": repr(filename),
-        "local_filename": repr(local_filename),
-        "force": repr(force),
-        "port": repr(port),
-        "user": repr(user),
-        "ssh_keyscan": repr(ssh_keyscan),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import ssh", "ssh.download", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
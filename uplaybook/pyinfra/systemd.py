@@ -6,12 +6,10 @@
 This module provides tasks for interacting with systemd.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _pyinfra_task
 
 
-@task
+@_pyinfra_task("systemd.daemon_reload")
 def daemon_reload(user_mode=False, machine=None, user_name=None):
     """
     Reload the systemd daemon to read unit file changes.
@@ -20,22 +18,12 @@ def daemon_reload(user_mode=False, machine=None, user_name=None):
     + machine: the machine name to connect to
     + user_name: connect to a specific user's systemd session
     """
-    operargs = {
-        "user_mode": repr(user_mode),
-        "machine": repr(machine),
-        "user_name": repr(user_name),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import systemd", "systemd.daemon_reload", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task(
+    "systemd.service",
+    cacheable="not (restarted or reloaded or command or daemon_reload)",
+)
 def service(
     service,
     running=True,
@@ -81,23 +69,3 @@ def service(
             enabled=True,
         )
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restarted": repr(restarted),
-        "reloaded": repr(reloaded),
-        "command": repr(command),
-        "enabled": repr(enabled),
-        "daemon_reload": repr(daemon_reload),
-        "user_mode": repr(user_mode),
-        "machine": repr(machine),
-        "user_name": repr(user_name),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import systemd", "systemd.service", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -7,12 +7,11 @@
 Manage sysvinit services (``/etc/init.d``).
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
+from . import _pyinfra_task, PyInfraFailed, PyInfraResults
 from typing import Optional, List
-from ..internals import task, TemplateStr, Return
 
 
-@task
+@_pyinfra_task("sysvinit.service", cacheable="not (restarted or reloaded or command)")
 def service(
     service, running=True, restarted=False, reloaded=False, enabled=None, command=None
 ):
@@ -48,25 +47,9 @@ def service(
             enabled=True,
         )
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restarted": repr(restarted),
-        "reloaded": repr(reloaded),
-        "enabled": repr(enabled),
-        "command": repr(command),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import sysvinit", "sysvinit.service", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("sysvinit.enable", cacheable=True)
 def enable(
     service,
     start_priority=20,
@@ -94,18 +77,3 @@ def enable(
             stop_levels=(0, 1, 2, 6),
         )
     """
-    operargs = {
-        "service": repr(service),
-        "start_priority": repr(start_priority),
-        "stop_priority": repr(stop_priority),
-        "start_levels": repr(start_levels),
-        "stop_levels": repr(stop_levels),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import sysvinit", "sysvinit.enable", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
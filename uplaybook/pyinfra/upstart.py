@@ -7,12 +7,11 @@
 Manage upstart services.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
+from . import _pyinfra_task, PyInfraFailed, PyInfraResults
 from typing import Optional, List
-from ..internals import task, TemplateStr, Return
 
 
-@task
+@_pyinfra_task("upstart.service", cacheable="not (restarted or reloaded or command)")
 def service(
     service, running=True, restarted=False, reloaded=False, command=None, enabled=None
 ):
@@ -32,19 +31,3 @@ def service(
         existence of a ``/etc/init/<service>.override`` file, and sets its content to
         "manual" to disable automatic start of services.
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restarted": repr(restarted),
-        "reloaded": repr(reloaded),
-        "command": repr(command),
-        "enabled": repr(enabled),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import upstart", "upstart.service", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -7,12 +7,11 @@
 The windows module handles misc windows operations.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
+from . import _pyinfra_task, PyInfraFailed, PyInfraResults
 from typing import Optional, List
-from ..internals import task, TemplateStr, Return
 
 
-@task
+@_pyinfra_task("windows.service")
 def service(service, running=True, restart=False, suspend=False):
     """
     Stop/Start a Windows service.
@@ -32,33 +31,10 @@ def service(service, running=True, restart=False, suspend=False):
             running=False,
         )
     """
-    operargs = {
-        "service": repr(service),
-        "running": repr(running),
-        "restart": repr(restart),
-        "suspend": repr(suspend),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows", "windows.service", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("windows.reboot")
 def reboot():
     """
     Restart the server.
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows", "windows.reboot", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -7,12 +7,13 @@
 The windows_files module handles windows filesystem state, file uploads and template generation.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _nothing_queued, _path_age, _pyinfra_task
+from .files import _checksums_match, _same_contents
+from ..internals import Return
+import os
 
 
-@task
+@_pyinfra_task("windows_files.download", precheck=True)
 def download(
     src,
     dest,
@@ -49,31 +50,29 @@ def download(
             dest="C:\docker",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "cache_time": repr(cache_time),
-        "force": repr(force),
-        "sha256sum": repr(sha256sum),
-        "sha1sum": repr(sha1sum),
-        "md5sum": repr(md5sum),
+    checksums = {
+        name: checksum
+        for name, checksum in (
+            ("sha256", sha256sum),
+            ("sha1", sha1sum),
+            ("md5", md5sum),
+        )
+        if checksum
     }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows_files",
-        "windows_files.download",
-        operargs,
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+    #  As for `files.download()`, an up to date file with the right checksums is left
+    #  alone without starting pyinfra.
+    if (
+        checksums
+        and not force
+        and os.path.isfile(dest)
+        and (not cache_time or _path_age(dest) <= cache_time)
+        and _nothing_queued()
+        and _checksums_match(dest, checksums)
+    ):
+        return Return(changed=False, extra_message="checksum matches")
+
+
+@_pyinfra_task("windows_files.put", precheck=True)
 def put(
     src,
     dest,
@@ -118,28 +117,18 @@ def put(
             dest="C:\data\content.json",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "dest": repr(dest),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "add_deploy_dir": repr(add_deploy_dir),
-        "create_remote_dir": repr(create_remote_dir),
-        "force": repr(force),
-        "assume_exists": repr(assume_exists),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows_files", "windows_files.put", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+    if (
+        not force
+        and user is None
+        and group is None
+        and mode is None
+        and _nothing_queued()
+        and _same_contents(src, dest)
+    ):
+        return Return(changed=False, extra_message="contents match")
+
+
+@_pyinfra_task("windows_files.file")
 def file(
     path,
     present=True,
@@ -177,48 +166,9 @@ def file(
             touch=True,
         )
     """
-    operargs = {
-        "path": repr(path),
-        "present": repr(present),
-        "assume_present": repr(assume_present),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "touch": repr(touch),
-        "create_remote_dir": repr(create_remote_dir),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows_files", "windows_files.file", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
-def _create_remote_dir(state, host, remote_filename, user, group):
-    operargs = {
-        "state": repr(state),
-        "host": repr(host),
-        "remote_filename": repr(remote_filename),
-        "user": repr(user),
-        "group": repr(group),
-    }
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows_files",
-        "windows_files._create_remote_dir",
-        operargs,
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("windows_files.directory")
 def directory(
     path,
     present=True,
@@ -263,45 +213,9 @@ def directory(
                 path=dir,
             )
     """
-    operargs = {
-        "path": repr(path),
-        "present": repr(present),
-        "assume_present": repr(assume_present),
-        "user": repr(user),
-        "group": repr(group),
-        "mode": repr(mode),
-        "recursive": repr(recursive),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows_files",
-        "windows_files.directory",
-        operargs,
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
-def _validate_path(path):
-    operargs = {
-        "path": repr(path),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows_files",
-        "windows_files._validate_path",
-        operargs,
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
 
-@task
+@_pyinfra_task("windows_files.link")
 def link(
     path,
     target=None,
@@ -345,22 +259,3 @@ def link(
             target=r"C\issue",
         )
     """
-    operargs = {
-        "path": repr(path),
-        "target": repr(target),
-        "present": repr(present),
-        "assume_present": repr(assume_present),
-        "user": repr(user),
-        "group": repr(group),
-        "symbolic": repr(symbolic),
-        "force": repr(force),
-        "create_remote_dir": repr(create_remote_dir),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import windows_files", "windows_files.link", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
@@ -7,44 +7,25 @@
 Manage XBPS packages and repositories. Note that XBPS package names are case-sensitive.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
+from . import _pyinfra_task, PyInfraFailed, PyInfraResults
 from typing import Optional, List
-from ..internals import task, TemplateStr, Return
 
 
-@task
+@_pyinfra_task("xbps.upgrade")
 def upgrade():
     """
     Upgrades all XBPS packages.
     """
-    operargs = {}
 
-    result = _run_pyinfra(
-        "from pyinfra.operations import xbps", "xbps.upgrade", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
-
-@task
+@_pyinfra_task("xbps.update")
 def update():
     """
     Update XBPS repositories.
     """
-    operargs = {}
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import xbps", "xbps.update", operargs
-    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
 
-
-@task
+@_pyinfra_task("xbps.packages")
 def packages(packages=None, present=True, update=False, upgrade=False):
     """
     Install/remove/update XBPS packages.
@@ -63,17 +44,3 @@ def packages(packages=None, present=True, update=False, upgrade=False):
             packages=["vimpager", "vim"],
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "update": repr(update),
-        "upgrade": repr(upgrade),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import xbps", "xbps.packages", operargs
-    )
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
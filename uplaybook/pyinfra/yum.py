@@ -6,9 +6,8 @@
 Manage yum packages and repositories. Note that yum package names are case-sensitive.
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _run_operation
+from ..internals import task
 
 
 @task
@@ -31,15 +30,9 @@ def key(src):
             src=f"https://download.docker.com/linux/{linux_id}/gpg",
         )
     """
-    operargs = {
-        "src": repr(src),
-    }
+    operargs = f"src={src!r}"
 
-    result = _run_pyinfra("from pyinfra.operations import yum", "yum.key", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation("from pyinfra.operations import yum", "yum.key", operargs)
 
 
 @task
@@ -85,21 +78,17 @@ def repo(
             baseurl="https://download.docker.com/linux/centos/7/$basearch/stable",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-        "baseurl": repr(baseurl),
-        "description": repr(description),
-        "enabled": repr(enabled),
-        "gpgcheck": repr(gpgcheck),
-        "gpgkey": repr(gpgkey),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import yum", "yum.repo", operargs)
+    operargs = (
+        f"src={src!r}, "
+        f"present={present!r}, "
+        f"baseurl={baseurl!r}, "
+        f"description={description!r}, "
+        f"enabled={enabled!r}, "
+        f"gpgcheck={gpgcheck!r}, "
+        f"gpgkey={gpgkey!r}"
+    )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation("from pyinfra.operations import yum", "yum.repo", operargs)
 
 
 @task
@@ -124,16 +113,9 @@ def rpm(src, present=True):
            src=f"https://dl.fedoraproject.org/pub/epel/epel-release-latest-{major_version}.noarch.rpm",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-    }
-
-    result = _run_pyinfra("from pyinfra.operations import yum", "yum.rpm", operargs)
+    operargs = f"src={src!r}, present={present!r}"
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation("from pyinfra.operations import yum", "yum.rpm", operargs)
 
 
 @task
@@ -141,13 +123,9 @@ def update():
     """
     Updates all yum packages.
     """
-    operargs = {}
+    operargs = ""
 
-    result = _run_pyinfra("from pyinfra.operations import yum", "yum.update", operargs)
-
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation("from pyinfra.operations import yum", "yum.update", operargs)
 
 
 @task
@@ -194,21 +172,17 @@ def packages(
             latest=True,
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "update": repr(update),
-        "clean": repr(clean),
-        "nobest": repr(nobest),
-        "extra_install_args": repr(extra_install_args),
-        "extra_uninstall_args": repr(extra_uninstall_args),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import yum", "yum.packages", operargs
+    operargs = (
+        f"packages={packages!r}, "
+        f"present={present!r}, "
+        f"latest={latest!r}, "
+        f"update={update!r}, "
+        f"clean={clean!r}, "
+        f"nobest={nobest!r}, "
+        f"extra_install_args={extra_install_args!r}, "
+        f"extra_uninstall_args={extra_uninstall_args!r}"
     )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation(
+        "from pyinfra.operations import yum", "yum.packages", operargs
+    )
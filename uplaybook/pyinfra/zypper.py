@@ -6,9 +6,8 @@
 
 """
 
-from . import _run_pyinfra, PyInfraFailed, PyInfraResults
-from typing import Optional, List
-from ..internals import task, TemplateStr, Return
+from . import _run_operation
+from ..internals import task
 
 
 @task
@@ -56,24 +55,20 @@ def repo(
             baseurl="https://download.opensuse.org/repositories/Virtualization:/containers/openSUSE_Tumbleweed/",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "baseurl": repr(baseurl),
-        "present": repr(present),
-        "description": repr(description),
-        "enabled": repr(enabled),
-        "gpgcheck": repr(gpgcheck),
-        "gpgkey": repr(gpgkey),
-        "type": repr(type),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import zypper", "zypper.repo", operargs
+    operargs = (
+        f"src={src!r}, "
+        f"baseurl={baseurl!r}, "
+        f"present={present!r}, "
+        f"description={description!r}, "
+        f"enabled={enabled!r}, "
+        f"gpgcheck={gpgcheck!r}, "
+        f"gpgkey={gpgkey!r}, "
+        f"type={type!r}"
     )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation(
+        "from pyinfra.operations import zypper", "zypper.repo", operargs
+    )
 
 
 @task
@@ -97,35 +92,24 @@ def rpm(src, present=True):
            src="https://github.com/go-task/task/releases/download/v2.8.1/task_linux_amd64.rpm",
         )
     """
-    operargs = {
-        "src": repr(src),
-        "present": repr(present),
-    }
+    operargs = f"src={src!r}, present={present!r}"
 
-    result = _run_pyinfra(
+    return _run_operation(
         "from pyinfra.operations import zypper", "zypper.rpm", operargs
     )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
 
 @task
 def update():
     """
     Updates all zypper packages.
     """
-    operargs = {}
+    operargs = ""
 
-    result = _run_pyinfra(
+    return _run_operation(
         "from pyinfra.operations import zypper", "zypper.update", operargs
     )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
-
 
 @task
 def packages(
@@ -173,22 +157,18 @@ def packages(
             latest=True,
         )
     """
-    operargs = {
-        "packages": repr(packages),
-        "present": repr(present),
-        "latest": repr(latest),
-        "update": repr(update),
-        "clean": repr(clean),
-        "extra_global_install_args": repr(extra_global_install_args),
-        "extra_install_args": repr(extra_install_args),
-        "extra_global_uninstall_args": repr(extra_global_uninstall_args),
-        "extra_uninstall_args": repr(extra_uninstall_args),
-    }
-
-    result = _run_pyinfra(
-        "from pyinfra.operations import zypper", "zypper.packages", operargs
+    operargs = (
+        f"packages={packages!r}, "
+        f"present={present!r}, "
+        f"latest={latest!r}, "
+        f"update={update!r}, "
+        f"clean={clean!r}, "
+        f"extra_global_install_args={extra_global_install_args!r}, "
+        f"extra_install_args={extra_install_args!r}, "
+        f"extra_global_uninstall_args={extra_global_uninstall_args!r}, "
+        f"extra_uninstall_args={extra_uninstall_args!r}"
     )
 
-    if result.errors:
-        return Return(failure=True)
-    return Return(changed=result.changed != 0)
+    return _run_operation(
+        "from pyinfra.operations import zypper", "zypper.packages", operargs
+    )